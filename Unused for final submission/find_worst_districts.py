@@ -1,7 +1,13 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
+
+# Shared pipeline modules (columnar_store.py, ...) live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hybrid_ranking import BUFFER_SD, hybrid_scores, safe_limit_matrix
+from weekly_aggregates import load_weekly_matrix
 
 # --- CONFIGURATION ---
 FILE_ENROL = "Cleaned_Final_Monthly_Data_Combined.csv"    
@@ -11,68 +17,23 @@ OUTPUT_FOLDER = "Top_20_District_Fraud_Graphs"
 if not os.path.exists(OUTPUT_FOLDER):
     os.makedirs(OUTPUT_FOLDER)
 
-# 1. LOAD DATA
+# 1. LOAD DATA (The Granular View)
 print("Loading Data...")
-df_enrol = pd.read_csv(FILE_ENROL, dtype={'Pincode': str}, low_memory=False)
-df_update = pd.read_csv(FILE_UPDATE, dtype={'Pincode': str}, low_memory=False)
-
-df_enrol.columns = df_enrol.columns.str.lower()
-df_update.columns = df_update.columns.str.lower()
-
-adult_bio_col = [c for c in df_update.columns if '17' in c and '5' not in c][0]
-
-for df in [df_enrol, df_update]:
-    df['date'] = pd.to_datetime(df['date'], dayfirst=True, errors='coerce')
-    
-df_enrol = df_enrol.dropna(subset=['date'])
-df_update = df_update.dropna(subset=['date'])
+# District x week matrices, memory-mapped from the weekly aggregate store (built
+# from the cleaned datasets on the first run, see weekly_aggregates.py)
+weekly = load_weekly_matrix('district', FILE_ENROL, FILE_UPDATE)
 
-# 2. AGGREGATE BY DISTRICT (The Granular View)
-print("Aggregating by District...")
-grp_enrol = df_enrol.groupby(['state', 'district', pd.Grouper(key='date', freq='W-MON')])['age_0_5'].sum().reset_index()
-grp_update = df_update.groupby(['state', 'district', pd.Grouper(key='date', freq='W-MON')])[adult_bio_col].sum().reset_index()
-
-merged = pd.merge(grp_enrol, grp_update, on=['state', 'district', 'date'], how='inner')
-merged.rename(columns={'age_0_5': 'New_Kids', adult_bio_col: 'Adult_Updates'}, inplace=True)
-
-# 3. RANKING LOGIC (Find the Worst Offenders)
+# 2. RANKING LOGIC (Find the Worst Offenders)
 print("Ranking Districts by Fraud Severity...")
-district_scores = []
-
-unique_districts = merged[['state', 'district']].drop_duplicates()
-
-for _, row in unique_districts.iterrows():
-    state = row['state']
-    district = row['district']
-    
-    dist_df = merged[(merged['state'] == state) & (merged['district'] == district)]
-    
-    # Skip tiny districts (Noise filter)
-    if dist_df['New_Kids'].sum() < 50: continue
-    
-    # Calculate Logic
-    ratio = (dist_df['New_Kids'] / dist_df['Adult_Updates'].replace(0, 1)).median()
-    safety_buffer = dist_df['New_Kids'].std() * 0.5
-    threshold = (dist_df['Adult_Updates'] * ratio) + safety_buffer
-    min_floor = dist_df['New_Kids'].quantile(0.1)
-    threshold = threshold.clip(lower=min_floor)
-    
-    # Check for anomalies
-    anomalies = dist_df[dist_df['New_Kids'] > threshold]
-    
-    if not anomalies.empty:
-        # Severity Score = Total number of extra kids found in fraud spikes
-        # This prioritizes BIG scams over tiny statistical blips
-        extra_kids = (anomalies['New_Kids'] - threshold.loc[anomalies.index]).sum()
-        district_scores.append({
-            'state': state,
-            'district': district,
-            'fraud_severity': extra_kids
-        })
-
-# Create DataFrame of scores and sort
-score_df = pd.DataFrame(district_scores)
+# Same threshold as everywhere (median ratio, 0.5 SD buffer, 10% floor), all districts at once
+limits = safe_limit_matrix(weekly)
+# Severity Score = Total number of extra kids found in fraud spikes (every week above the
+# threshold counts here, no AI confirmation). This prioritizes BIG scams over tiny statistical blips
+score_df = hybrid_scores(weekly, limits, True)
 score_df = score_df.sort_values(by='fraud_severity', ascending=False)
+# Highlighted on the graphs: weeks at least 10% above the threshold
+with np.errstate(invalid='ignore'):
+    spikes = weekly.kids > limits * 1.1
 
 # Get Top 20
 top_20 = score_df.head(20)
@@ -91,14 +52,8 @@ for _, row in top_20.iterrows():
     district = row['district']
     
     try:
-        dist_df = merged[(merged['state'] == state) & (merged['district'] == district)].copy()
-        
-        # Recalculate Threshold for plotting
-        ratio = (dist_df['New_Kids'] / dist_df['Adult_Updates'].replace(0, 1)).median()
-        safety_buffer = dist_df['New_Kids'].std() * 0.5
-        dist_df['Safe_Limit'] = (dist_df['Adult_Updates'] * ratio) + safety_buffer
-        min_floor = dist_df['New_Kids'].quantile(0.1)
-        dist_df['Safe_Limit'] = dist_df['Safe_Limit'].clip(lower=min_floor)
+        dist_df = weekly.series(weekly.index_of(state, district), Safe_Limit=limits, Spike=spikes)
+        safety_buffer = dist_df['New_Kids'].std() * BUFFER_SD   # places the annotation
 
         # Plotting
         fig, ax1 = plt.subplots(figsize=(12, 6))
@@ -114,8 +69,7 @@ for _, row in top_20.iterrows():
         ax2.fill_between(dist_df['date'], dist_df['Adult_Updates'], color='grey', alpha=0.15, label='Adult Activity')
         
         # Highlight Fraud
-        anomalies = dist_df[dist_df['New_Kids'] > dist_df['Safe_Limit']]
-        real_anomalies = anomalies[anomalies['New_Kids'] > (anomalies['Safe_Limit'] * 1.1)]
+        real_anomalies = dist_df[dist_df['Spike']]
         
         if not real_anomalies.empty:
             ax1.scatter(real_anomalies['date'], real_anomalies['New_Kids'], color='red', s=100, zorder=10, edgecolors='black')
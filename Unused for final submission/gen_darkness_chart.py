@@ -1,7 +1,11 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
+
+# Shared pipeline modules (columnar_store.py, ...) live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_loader import load_dataset
 
 # --- CONFIGURATION ---
 INPUT_FILE = "Cleaned_Final_Monthly_Data_Combined.csv"
@@ -12,15 +16,13 @@ if not os.path.exists(OUTPUT_FOLDER):
 
 # --- 1. LOAD AND PREPARE DATA ---
 print(f"Loading {INPUT_FILE}...")
-df = pd.read_csv(INPUT_FILE, low_memory=False)
-df.columns = df.columns.str.lower()
 age_cols = ['age_0_5', 'age_5_17', 'age_18_greater']
-for col in age_cols:
-    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+# Counts arrive as int32 (blanks already 0); only the columns used below are read
+df = load_dataset('enrolment', columns=['state', 'district'] + age_cols, path=INPUT_FILE)
 
 # --- 2. CALCULATE EXCLUSION SCORES (Same as before) ---
 print("Calculating Digital Exclusion Score for all districts...")
-district_totals = df.groupby(['state', 'district'])[age_cols].sum().reset_index()
+district_totals = df.groupby(['state', 'district'], observed=True)[age_cols].sum().reset_index()
 district_totals['Total_Enrolments'] = district_totals[age_cols].sum(axis=1)
 district_totals['Adult_Enrolment_Ratio'] = district_totals['age_18_greater'] / (district_totals['Total_Enrolments'] + 1)
 
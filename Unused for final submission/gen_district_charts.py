@@ -2,13 +2,19 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
+
+# Shared pipeline modules (columnar_store.py, ...) live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar_store import columnar_path
+from dataset_loader import DATASETS, load_dataset
 
 # --- CONFIGURATION ---
-FILES_TO_MERGE = [
-    "Cleaned_Final_Monthly_Data_Combined.csv",
-    "Cleaned_Final_Biometric_Data_Combined.csv",
-    "Cleaned_Final_Demographic_Data_Combined.csv"
-]
+FILES_TO_MERGE = {
+    'enrolment': "Cleaned_Final_Monthly_Data_Combined.csv",
+    'biometric': "Cleaned_Final_Biometric_Data_Combined.csv",
+    'demographic': "Cleaned_Final_Demographic_Data_Combined.csv"
+}
 OUTPUT_FOLDER = "District_Accessibility_Charts_Vertical"
 
 if not os.path.exists(OUTPUT_FOLDER):
@@ -16,10 +22,11 @@ if not os.path.exists(OUTPUT_FOLDER):
 
 # --- 1. LOAD AND PREPARE DATA ---
 print("Loading and preparing data...")
-all_dfs = [pd.read_csv(f, low_memory=False) for f in FILES_TO_MERGE if os.path.exists(f)]
+all_dfs = [
+    load_dataset(name, columns=['date', 'state', 'district'] + DATASETS[name]['counts'], path=f)
+    for name, f in FILES_TO_MERGE.items() if os.path.exists(f) or os.path.exists(columnar_path(f))
+]
 full_df = pd.concat(all_dfs, ignore_index=True)
-full_df.columns = full_df.columns.str.lower()
-full_df['date'] = pd.to_datetime(full_df['date'], dayfirst=True, errors='coerce')
 full_df = full_df.dropna(subset=['date'])
 metric_cols = [c for c in ['age_0_5', 'age_5_17', 'age_18_greater', 'bio_age_5_17', 'bio_age_17_', 'bio_age_17+', 'demo_age_5_17', 'demo_age_17_', 'demo_age_17+'] if c in full_df.columns]
 full_df['total_events'] = full_df[metric_cols].sum(axis=1)
@@ -27,8 +34,8 @@ full_df['total_events'] = full_df[metric_cols].sum(axis=1)
 # --- 2. CALCULATE DISTRICT-LEVEL SCORES ---
 print("Calculating scores for all districts...")
 full_df['day_name'] = full_df['date'].dt.day_name()
-district_day_activity = full_df.groupby(['state', 'district', 'day_name'])['total_events'].sum().reset_index()
-pivot_df = district_day_activity.pivot_table(index=['state', 'district'], columns='day_name', values='total_events').fillna(0)
+district_day_activity = full_df.groupby(['state', 'district', 'day_name'], observed=True)['total_events'].sum().reset_index()
+pivot_df = district_day_activity.pivot_table(index=['state', 'district'], columns='day_name', values='total_events', observed=True).fillna(0)
 pivot_df['Total_Weekly_Events'] = pivot_df.sum(axis=1)
 if 'Sunday' in pivot_df.columns:
     pivot_df['Sunday_Score_%'] = (pivot_df['Sunday'] / pivot_df['Total_Weekly_Events']) * 100
@@ -2,23 +2,29 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
+
+# Shared pipeline modules (columnar_store.py, ...) live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar_store import columnar_path
+from dataset_loader import DATASETS, load_dataset
 
 # --- CONFIGURATION ---
-FILES_TO_MERGE = [
-    "Cleaned_Final_Monthly_Data_Combined.csv",
-    "Cleaned_Final_Biometric_Data_Combined.csv",
-    "Cleaned_Final_Demographic_Data_Combined.csv"
-]
+FILES_TO_MERGE = {
+    'enrolment': "Cleaned_Final_Monthly_Data_Combined.csv",
+    'biometric': "Cleaned_Final_Biometric_Data_Combined.csv",
+    'demographic': "Cleaned_Final_Demographic_Data_Combined.csv"
+}
 OUTPUT_REPORT_FILE = "State_Accessibility_Report_V2.csv"
 OUTPUT_CHART_FILE = "Chart_State_Accessibility_V2.png"
 
 # --- 1. LOAD AND MERGE DATA ---
 print("Loading and merging all datasets...")
 all_dfs = []
-for file in FILES_TO_MERGE:
-    if os.path.exists(file):
+for name, file in FILES_TO_MERGE.items():
+    if os.path.exists(file) or os.path.exists(columnar_path(file)):
         try:
-            df = pd.read_csv(file, low_memory=False)
+            df = load_dataset(name, columns=['date', 'state'] + DATASETS[name]['counts'], path=file)
             all_dfs.append(df)
         except Exception as e:
             print(f"Warning: Could not read {file}. Error: {e}")
@@ -28,8 +34,6 @@ if not all_dfs:
     exit()
 
 full_df = pd.concat(all_dfs, ignore_index=True)
-full_df.columns = full_df.columns.str.lower()
-full_df['date'] = pd.to_datetime(full_df['date'], dayfirst=True, errors='coerce')
 full_df = full_df.dropna(subset=['date'])
 
 # --- THE FIX: DEFINE 'valid_cols' HERE ---
@@ -46,7 +50,7 @@ full_df['total_events'] = full_df[valid_cols].sum(axis=1)
 # --- 2. DAY OF WEEK ANALYSIS ---
 print("Analyzing Day of Week activity...")
 full_df['day_name'] = full_df['date'].dt.day_name()
-state_day_activity = full_df.groupby(['state', 'day_name'])['total_events'].sum().reset_index()
+state_day_activity = full_df.groupby(['state', 'day_name'], observed=True)['total_events'].sum().reset_index()
 pivot_df = state_day_activity.pivot(index='state', columns='day_name', values='total_events').fillna(0)
 pivot_df['Total_Weekly_Events'] = pivot_df.sum(axis=1)
 if 'Sunday' in pivot_df.columns:
@@ -1,7 +1,15 @@
+import os
+import sys
+
 import pandas as pd
 
+# Shared pipeline modules (pincode_lookup.py, ...) live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pincode_lookup import load_master_lookup
+
 # --- CONFIGURATION ---
 INPUT_FILE = "Final_Submission_Data.csv"
+PINCODE_FILE = "pincode_master_unique.csv"     # Lat/Long per pincode (see pincode.py)
 
 print(f"Loading {INPUT_FILE}...")
 df = pd.read_csv(INPUT_FILE, dtype={'Pincode': str}, low_memory=False)
@@ -10,7 +18,11 @@ df = pd.read_csv(INPUT_FILE, dtype={'Pincode': str}, low_memory=False)
 adult_col = [c for c in df.columns if '17' in c and '5' not in c][0]
 df[adult_col] = pd.to_numeric(df[adult_col], errors='coerce').fillna(0)
 
-# 2. Filter for Valid GPS
+# 2. Map GPS from the Pincode Master (cached arrays), else use the file's own Lat/Long
+if os.path.exists(PINCODE_FILE):
+    df['Latitude'], df['Longitude'] = load_master_lookup(PINCODE_FILE).coordinates(df['Pincode'])
+
+# Filter for Valid GPS
 df = df.dropna(subset=['Latitude', 'Longitude'])
 
 # 3. CREATE SMART GRID (Round to 2 decimals = ~1.1km grid)
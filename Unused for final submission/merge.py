@@ -1,5 +1,10 @@
 import pandas as pd
 import os
+import sys
+
+# Shared pipeline modules (pincode_lookup.py, ...) live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pincode_lookup import load_master_lookup
 
 # --- CONFIGURATION ---
 INPUT_FILE = "aadhaar_monthly_data_full.csv"     # The file you just cleaned
@@ -13,22 +18,20 @@ df = pd.read_csv(INPUT_FILE, low_memory=False)
 # Ensure it is a string and remove decimals "500001.0" -> "500001"
 df['Pincode'] = df['Pincode'].astype(str).str.replace(r'\.0$', '', regex=True)
 
-# 2. Load Pincode Master
+# 2. Load Pincode Master (compiled arrays, cached by the file's hash)
 if os.path.exists(PINCODE_FILE):
-    print("Merging with Pincode Master...")
-    pin_master = pd.read_csv(PINCODE_FILE, dtype={'Pincode': str})
-    
-    # Merge (Left Join)
-    df = df.merge(pin_master, on='Pincode', how='left')
-    
+    print("Mapping against Pincode Master...")
+    lookup = load_master_lookup(PINCODE_FILE)
+
     # 3. FIX STATE NAMES (The Magic Step)
-    # If we found a match in the Master file (State_y), use it.
+    # If the pincode is in the Master file, use its names; otherwise keep the original.
     # This automatically converts "West Bengli" -> "West Bengal"
-    df['State'] = df['State_y'].fillna(df['State_x'])
-    df['District'] = df['District_y'].fillna(df['District_x'])
-    
-    # Drop the dirty columns
-    df.drop(columns=['State_x', 'District_x', 'State_y', 'District_y'], inplace=True)
+    df['State'], df['District'] = lookup.official_names(
+        df['Pincode'],
+        df['State'].to_numpy(dtype=object),
+        df['District'].to_numpy(dtype=object),
+    )
+    df['Latitude'], df['Longitude'] = lookup.coordinates(df['Pincode'])
 else:
     print("⚠️ Pincode Master not found! skipping map fix.")
 
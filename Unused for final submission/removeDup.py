@@ -1,28 +1,17 @@
-import pandas as pd
+import os
+import sys
+
+# Shared pipeline modules (dedup_rows.py, ...) live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dedup_rows import dedup_csv
 
 # --- CONFIGURATION ---
 INPUT_FILE = "aadhaar_biometric_5M_rows.csv"  # The messy file with 6M rows
 OUTPUT_FILE = "aadhaar_biometric_clean.csv"    # The new clean file
 
-print(f"Loading {INPUT_FILE}... (This may take a minute)")
-# low_memory=False ensures it reads messy columns correctly
-df = pd.read_csv(INPUT_FILE, low_memory=False)
-
-original_count = len(df)
-print(f"Original Row Count: {original_count:,}")
+# Memory stays within this budget however big the file is (rows are hashed and partitioned to disk)
+MEMORY_BUDGET_MB = 512
 
 # THE CLEANING STEP
-print("Removing duplicate rows...")
-df.drop_duplicates(inplace=True)
-
-new_count = len(df)
-removed_count = original_count - new_count
-
-print("-" * 30)
-print(f"Clean Row Count:    {new_count:,}")
-print(f"Duplicates Removed: {removed_count:,}")
-print("-" * 30)
-
-print(f"Saving to {OUTPUT_FILE}...")
-df.to_csv(OUTPUT_FILE, index=False)
-print("Done! Use the new file for your analysis.")
\ No newline at end of file
+dedup_csv(INPUT_FILE, OUTPUT_FILE, memory_mb=MEMORY_BUDGET_MB)
+print("Done! Use the new file for your analysis.")
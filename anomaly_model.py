@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import joblib
+import numpy as np
+import sklearn
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# The AI half of the hybrid detector: an Isolation Forest over each
+# district-week's New_Kids and kids-per-adult ratio.
+FEATURES = ['New_Kids', 'Dependency_Ratio']
+CONTAMINATION = 0.05   # share of weeks flagged
+RANDOM_STATE = 42
+
+# Grouped mode: one model per state (or per volume band of similar districts),
+# fitted in a process pool. Groups with fewer district-weeks than this share one
+# pooled model, since a forest needs some data to learn what "normal" is.
+MIN_GROUP_WEEKS = 100
+POOLED = "(pooled small groups)"
+VOLUME_BANDS = 8
+WORKERS = os.cpu_count() or 1
+
+# Fitted national models are kept as numbered versions, ARTIFACT_DIR/v0001/ ...:
+# the scaler and the forest (joblib) plus meta.json (parameters, library
+# versions, and a fingerprint of the training rows), written last.
+ARTIFACT_DIR = "AI_Model_Artifacts"
+META_FILE = "meta.json"
+
+
+def add_features(df):
+    """Adds Adult_Updates_Safe and Dependency_Ratio (New_Kids per adult update) to a weekly table."""
+    # AI needs to compare "Kids" vs "Ratio"
+    df['Adult_Updates_Safe'] = df['Adult_Updates'].replace(0, 1)
+    df['Dependency_Ratio'] = df['New_Kids'] / df['Adult_Updates_Safe']
+    return df
+
+
+# ==========================================
+# 1. GROUPS
+# ==========================================
+def model_groups(df, by='state', min_weeks=MIN_GROUP_WEEKS):
+    """
+    The model each row of the weekly table belongs to: its state (by='state'),
+    or its district's volume band (by='volume': VOLUME_BANDS quantile bands of
+    the district's median weekly adult updates, so districts of similar size
+    are judged together). Groups smaller than min_weeks are merged into POOLED.
+    """
+    if by == 'state':
+        groups = df['state'].astype(str)
+    elif by == 'volume':
+        volume = df.groupby(['state', 'district'], observed=True)['Adult_Updates'].transform('median')
+        band = pd.qcut(volume.rank(method='dense'), VOLUME_BANDS, labels=False, duplicates='drop')
+        groups = "volume band " + band.astype(str)
+    else:
+        raise ValueError(f"unknown grouping {by!r} (expected 'state' or 'volume')")
+    sizes = groups.map(groups.value_counts())
+    return groups.where(sizes >= min_weeks, POOLED).to_numpy()
+
+
+# ==========================================
+# 2. FIT & SCORE (one group per process)
+# ==========================================
+def fit_scores(X, n_jobs=1):
+    """Scaler + forest fitted on the feature rows X. Returns their score_samples (lower = more anomalous)."""
+    X_scaled = StandardScaler().fit_transform(X)
+    model = IsolationForest(random_state=RANDOM_STATE, n_jobs=n_jobs).fit(X_scaled)
+    return model.score_samples(X_scaled)
+
+
+def _fit_group(task):
+    return fit_scores(*task)
+
+
+def _fit_all(tasks, workers):
+    """Yields each task's scores in task order, fitting up to `workers` groups at once."""
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _fit_group(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        # map() hands results back in submission order, whatever order the workers finish in
+        yield from executor.map(_fit_group, tasks)
+
+
+def calibrate(scores, groups):
+    """
+    Puts every group's scores on one scale: robust z-scores within the group
+    ((score - median) / (1.4826 x MAD)), so "unusual for its own group" is
+    comparable across groups and one national threshold can be applied.
+    """
+    calibrated = np.empty(len(scores))
+    for group in pd.unique(groups):
+        rows = groups == group
+        s = scores[rows]
+        median = np.median(s)
+        spread = 1.4826 * np.median(np.abs(s - median))
+        if not spread > 0:
+            spread = s.std() if s.std() > 0 else 1.0
+        calibrated[rows] = (s - median) / spread
+    return calibrated
+
+
+def grouped_scores(df, by='state', workers=WORKERS, min_weeks=MIN_GROUP_WEEKS):
+    """
+    Fits one scaler + Isolation Forest per group (see model_groups) and scores
+    each row of the weekly table with its group's model. Groups are fitted in a
+    pool of `workers` processes, each fit using the remaining cores (n_jobs).
+    Returns (calibrated scores, group of each row); lower = more anomalous.
+    """
+    groups = model_groups(df, by, min_weeks)
+    names = sorted(pd.unique(groups), key=lambda g: -(groups == g).sum())   # largest first
+    workers = max(1, min(workers, len(names)))
+    n_jobs = max(1, WORKERS // workers)
+    X = df[FEATURES].to_numpy(dtype=float)
+
+    print(f"  {len(names)} models ({by}), {workers} process{'es' if workers != 1 else ''} "
+          f"x {n_jobs} thread{'s' if n_jobs != 1 else ''} each")
+    scores = np.empty(len(df))
+    tasks = [(X[groups == name], n_jobs) for name in names]
+    for name, group_scores in zip(names, _fit_all(tasks, workers)):
+        scores[groups == name] = group_scores
+    return calibrate(scores, groups), groups
+
+
+def flag_anomalies(scores, contamination=CONTAMINATION):
+    """True for the `contamination` share of rows with the lowest scores (as IsolationForest.predict)."""
+    return scores < np.percentile(scores, 100.0 * contamination)
+
+
+# ==========================================
+# 3. VERSIONED ARTIFACTS
+# ==========================================
+def training_fingerprint(df, keys=('state', 'district')):
+    """SHA-256 of the training rows (keys, week and features), independent of row labels."""
+    rows = df[list(keys) + ['date'] + FEATURES]
+    return hashlib.sha256(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def _versions(artifact_dir):
+    if not os.path.isdir(artifact_dir):
+        return []
+    # A version without meta.json was never finished
+    return sorted(name for name in os.listdir(artifact_dir)
+                  if name.startswith('v') and os.path.exists(os.path.join(artifact_dir, name, META_FILE)))
+
+
+def save_artifacts(scaler, model, df, artifact_dir=ARTIFACT_DIR):
+    """Saves a fitted scaler + forest as the next version, with what they were trained on. Returns its path."""
+    versions = _versions(artifact_dir)
+    number = int(versions[-1][1:]) + 1 if versions else 1
+    path = os.path.join(artifact_dir, f"v{number:04d}")
+    os.makedirs(path, exist_ok=True)
+    joblib.dump(scaler, os.path.join(path, "scaler.joblib"))
+    joblib.dump(model, os.path.join(path, "model.joblib"))
+
+    meta = {
+        'version': number,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'features': FEATURES,
+        'contamination': model.contamination,
+        'random_state': model.random_state,
+        'sklearn': sklearn.__version__,
+        'training_rows': len(df),
+        'training_fingerprint': training_fingerprint(df),
+        'first_week': str(df['date'].min().date()),
+        'last_week': str(df['date'].max().date()),
+    }
+    with open(os.path.join(path, META_FILE + ".part"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(path, META_FILE + ".part"), os.path.join(path, META_FILE))
+    return path
+
+
+def load_artifacts(path=None, artifact_dir=ARTIFACT_DIR):
+    """(scaler, model, meta) of a saved version (default: the newest), or None if there is none."""
+    if path is None:
+        versions = _versions(artifact_dir)
+        if not versions:
+            return None
+        path = os.path.join(artifact_dir, versions[-1])
+    with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta['sklearn'] != sklearn.__version__:
+        print(f"  Warning: {path} was saved with scikit-learn {meta['sklearn']}, "
+              f"running {sklearn.__version__}: scores may differ")
+    return joblib.load(os.path.join(path, "scaler.joblib")), joblib.load(os.path.join(path, "model.joblib")), meta
+
+
+def matches(meta, df, contamination=CONTAMINATION, random_state=RANDOM_STATE):
+    """True if a saved version was fitted with these parameters on exactly these rows."""
+    return (meta['features'] == FEATURES and meta['contamination'] == contamination
+            and meta['random_state'] == random_state and meta['training_fingerprint'] == training_fingerprint(df))
@@ -1,7 +1,16 @@
+import argparse
+import itertools
 import pandas as pd
 import os
-import requests
-import io
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from columnar_store import (DATE_FORMAT, ParquetChunkWriter, columnar_path, iter_table, parquet_available,
+                           split_table, to_typed_frame)
+from name_normalizer import normalize_districts, normalize_states
+from pincode_lookup import PincodeLookup, load_master_lookup
 
 # ==========================================
 # CONFIGURATION
@@ -12,105 +21,223 @@ FILES_TO_CLEAN = [
     "Final_Monthly_Data_Combined.csv"
 ]
 
+# The processed master from pincode.py (downloaded if missing). Its compiled
+# lookup arrays are cached in .pincode_cache/ and rebuilt when the file changes.
 PINCODE_MASTER_FILE = "pincode_master_unique.csv"
 
+# Every cleaned file is saved as a typed Parquet file (what the analysis scripts load).
+# Set to False to skip the CSV copy.
+EXPORT_CSV = True
+
+# Rows cleaned at a time. Memory use is a few times this many rows, not the whole file.
+CHUNK_ROWS = 200_000
+
+# Pieces (of all files) cleaned at the same time, one process each. 1 = no process pool.
+WORKERS = os.cpu_count() or 1
+
 # ==========================================
-# 1. GET THE PINCODE MASTER
+# 1. THE CLEANING FUNCTION
 # ==========================================
-def get_pincode_master():
+def clean_chunk(df, lookup):
     """
-    Loads local master file or downloads one if missing.
-    Returns a dataframe with: [Pincode, Official_State, Official_District]
+    Geotags and normalises one chunk of a merged dataset.
+    `lookup` is a PincodeLookup (the master compiled into pincode-indexed arrays).
     """
-    if os.path.exists(PINCODE_MASTER_FILE):
-        print(f"Loading local Pincode Master: {PINCODE_MASTER_FILE}...")
-        df = pd.read_csv(PINCODE_MASTER_FILE, dtype=str)
-    else:
-        print("Pincode Master not found locally. Downloading from GitHub...")
-        url = "https://raw.githubusercontent.com/sanand0/pincode/master/data/IN.csv"
-        s = requests.get(url).content
-        df = pd.read_csv(io.StringIO(s.decode('utf-8')), dtype=str)
-        # Rename standard columns
-        df.rename(columns={'key': 'Pincode', 'admin_name1': 'State', 'admin_name2': 'District'}, inplace=True)
-
-    # Standardize columns
-    # We only keep Pincode, State, District (No Lat/Long as requested)
-    df = df[['Pincode', 'State', 'District']]
-    
-    # Rename to "Official" to avoid collision during merge
-    df.columns = ['Pincode', 'Official_State', 'Official_District']
-    
-    # Deduplicate (One State/District per Pincode)
-    df.drop_duplicates(subset=['Pincode'], inplace=True)
-    return df
-
-# ==========================================
-# 2. THE CLEANING FUNCTION
-# ==========================================
-def clean_file(filename, master_df):
-    if not os.path.exists(filename):
-        print(f"Skipping {filename} (File not found)")
-        return
-
-    print(f"\nProcessing {filename}...")
-    
-    # Load raw data
-    # low_memory=False is crucial for large files
-    df = pd.read_csv(filename, low_memory=False)
-    
-    # Normalize Pincode Column Name and Type
+    # Normalize Pincode Column Name
     # Users file has lowercase 'pincode', Master has 'Pincode'
     # We standardize to 'Pincode'
-    col_map = {c: c for c in df.columns}
-    for c in df.columns:
-        if c.lower() == 'pincode':
-            col_map[c] = 'Pincode'
-    df.rename(columns=col_map, inplace=True)
-    
-    # Clean Pincode values (remove decimals, ensure string)
-    df['Pincode'] = df['Pincode'].astype(str).str.replace(r'\.0$', '', regex=True)
-    
-    # MERGE
-    print("  Merging with Pincode Master...")
-    merged = df.merge(master_df, on='Pincode', how='left')
-    
+    df = df.rename(columns={c: 'Pincode' for c in df.columns if c.lower() == 'pincode'})
+
     # IDENTIFY STATE/DISTRICT COLUMNS
     # The raw file might have 'state', 'State', 'district', 'District'
     state_col = next((c for c in df.columns if c.lower() == 'state'), None)
     dist_col = next((c for c in df.columns if c.lower() == 'district'), None)
-    
-    if state_col and dist_col:
-        # REPLACE LOGIC
-        # Use Official Name. If NaN (Pincode not found), keep Original Name.
-        merged[state_col] = merged['Official_State'].fillna(merged[state_col])
-        merged[dist_col] = merged['Official_District'].fillna(merged[dist_col])
-        
-        # TITLE CASE (Clean formatting)
-        merged[state_col] = merged[state_col].astype(str).str.title().str.strip()
-        merged[dist_col] = merged[dist_col].astype(str).str.strip().str.title()
-        
-        print("  State/District names standardized.")
+    if not (state_col and dist_col):
+        return df, False
+
+    # LOOKUP (no join): each row's pincode indexes straight into the master arrays.
+    # Use Official Name. If the Pincode is not in the master, keep Original Name.
+    official_state, official_district = lookup.official_names(
+        df['Pincode'],
+        df[state_col].to_numpy(dtype=object, na_value=float('nan')),
+        df[dist_col].to_numpy(dtype=object, na_value=float('nan')),
+    )
+
+    # TITLE CASE + ALIASES ("West Bengli" -> "West Bengal", "Orissa" -> "Odisha")
+    # Done once per distinct name and mapped back to the rows as categories
+    df[state_col] = pd.Series(normalize_states(official_state), index=df.index)
+    df[dist_col] = pd.Series(normalize_districts(official_district), index=df.index)
+    return df, True
+
+
+# ==========================================
+# 2. CLEAN ONE PIECE (runs in a worker process)
+# ==========================================
+# The master lookup arrays, attached once per worker process by _init_worker().
+# They are memory-mapped read-only from disk, so all workers share one copy
+# and nothing is pickled per task.
+_LOOKUP = None
+
+
+def _init_worker(lookup_dir):
+    global _LOOKUP
+    _LOOKUP = PincodeLookup.load(lookup_dir, mmap=True)
+
+
+def _clean_piece(task, lookup=None):
+    """
+    Cleans one piece of a merged file (see columnar_store.split_table) into its
+    own part files: a headerless CSV and a Parquet file. Every chunk reports
+    its throughput as it finishes, tagged with the piece's label.
+    """
+    filename, piece, label, part_stem, chunk_rows, export_csv = task
+    if lookup is None:
+        lookup = _LOOKUP
+
+    rows, columns, normalized = 0, None, True
+    with ParquetChunkWriter(part_stem + ".parquet") as columnar, \
+            open(part_stem + ".csv" if export_csv else os.devnull, 'w', newline='', encoding='utf-8') as out:
+        chunk_started = time.perf_counter()
+        for i, chunk in enumerate(iter_table(filename, chunk_rows, piece=piece, quiet=True), start=1):
+            chunk, ok = clean_chunk(chunk, lookup)
+            normalized = normalized and ok
+            columns = list(chunk.columns)
+            chunk.to_csv(out, index=False, header=False, date_format=DATE_FORMAT)
+            columnar.write(to_typed_frame(chunk))
+            rows += len(chunk)
+
+            now = time.perf_counter()
+            # One write per line, flushed: the worker processes share the terminal
+            print(f"  {label} chunk {i}: {len(chunk):,} rows in {now - chunk_started:.2f}s "
+                  f"({len(chunk) / max(now - chunk_started, 1e-9):,.0f} rows/s)\n", end='', flush=True)
+            chunk_started = now
+
+    return {'rows': rows, 'columns': columns, 'normalized': normalized}
+
+
+def _clean_all(tasks, lookup, lookup_dir, workers):
+    """Yields each task's result in task order, cleaning up to `workers` pieces at once."""
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _clean_piece(task, lookup)
+        return
+
+    # A cached master is already on disk; otherwise write the arrays out once
+    if lookup.directory is None:
+        lookup.save(lookup_dir)
     else:
-        print("  WARNING: Could not find 'state' or 'district' columns to clean.")
+        lookup_dir = lookup.directory
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                             initializer=_init_worker, initargs=(lookup_dir,)) as executor:
+        yield from executor.map(_clean_piece, tasks)
 
-    # DROP HELPER COLUMNS
-    merged.drop(columns=['Official_State', 'Official_District'], inplace=True, errors='ignore')
-    
-    # SAVE
-    output_name = "Cleaned_" + filename
-    merged.to_csv(output_name, index=False)
-    print(f"  Saved to: {output_name}")
+
+# ==========================================
+# 3. CLEAN THE FILES
+# ==========================================
+def _write_output(filename, tasks, results, export_csv, chunk_rows):
+    """Stitches one file's part files, in order, into "Cleaned_<filename>" (in the working directory)."""
+    output_name = "Cleaned_" + os.path.basename(filename)
+    temp_file = output_name + ".part"
+    header = next((r['columns'] for r in results if r['columns']), None)
+
+    # Parquet writer opened first so it closes last: load_table() only trusts
+    # a Parquet file at least as new as its CSV
+    with ParquetChunkWriter(columnar_path(output_name)) as columnar, \
+            open(temp_file if export_csv else os.devnull, 'wb') as out:
+        if header:
+            out.write(pd.DataFrame(columns=header).to_csv(index=False).encode('utf-8'))
+        for (_, _, _, part_stem, _, _) in tasks:
+            if export_csv:
+                with open(part_stem + ".csv", 'rb') as part:
+                    shutil.copyfileobj(part, out)
+            if os.path.exists(part_stem + ".parquet"):
+                columnar.append_file(part_stem + ".parquet", batch_size=chunk_rows)
+
+    if export_csv:
+        os.replace(temp_file, output_name)
+    elif os.path.exists(temp_file):
+        os.remove(temp_file)
+    return output_name if export_csv else columnar_path(output_name)
+
+
+def clean_files(filenames, lookup, workers=WORKERS, chunk_rows=CHUNK_ROWS):
+    """
+    Geotags and normalises the merged datasets into "Cleaned_<filename>".
+
+    Each file is split into pieces of about `chunk_rows` rows (Parquet row
+    groups, or byte ranges of a CSV without a Parquet twin), and the pieces
+    of all files are cleaned concurrently in a pool of `workers` processes.
+    Every piece is streamed in chunks, so memory stays at a few chunks per
+    worker whatever the file size. The parts are stitched back in order, so
+    the output is identical to a single-process run.
+    """
+    found = []
+    for filename in filenames:
+        if os.path.exists(filename) or os.path.exists(columnar_path(filename)):
+            found.append(filename)
+        else:
+            print(f"Skipping {filename} (File not found)")
+    if not found:
+        return
+
+    export_csv = EXPORT_CSV or not parquet_available()
+    work_dir = tempfile.mkdtemp(prefix="clean_", dir=".")
+    started = time.perf_counter()
+    total_rows = 0
+    results = None
+
+    try:
+        tasks = []
+        for i, filename in enumerate(found):
+            pieces = split_table(filename, chunk_rows)
+            for j, piece in enumerate(pieces):
+                tasks.append((filename, piece, f"{filename} piece {j + 1}/{len(pieces)}",
+                              os.path.join(work_dir, f"{i:02d}_{j:05d}"), chunk_rows, export_csv))
+        print(f"\nCleaning {len(found)} file(s) in {len(tasks)} piece(s) "
+              f"({workers} worker{'s' if workers != 1 else ''})...")
+
+        results = _clean_all(tasks, lookup, os.path.join(work_dir, "master"), workers)
+        for filename in found:
+            file_tasks = [task for task in tasks if task[0] == filename]
+            file_results = list(itertools.islice(results, len(file_tasks)))
+            saved = _write_output(filename, file_tasks, file_results, export_csv, chunk_rows)
+            rows = sum(r['rows'] for r in file_results)
+            total_rows += rows
+            if not all(r['normalized'] for r in file_results):
+                print("  WARNING: Could not find 'state' or 'district' columns to clean.")
+            print(f"  [+] {filename}: {rows:,} rows. Saved to: {saved}")
+    finally:
+        if results is not None:
+            results.close()  # on error: shut the pool down before its part files are deleted
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    print(f"{total_rows:,} rows cleaned in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def clean_file(filename, lookup, chunk_rows=CHUNK_ROWS):
+    """Cleans a single file in this process."""
+    clean_files([filename], lookup, workers=1, chunk_rows=chunk_rows)
 
 # ==========================================
 # EXECUTION
 # ==========================================
 if __name__ == "__main__":
-    # 1. Load Master Key
-    master_df = get_pincode_master()
-    print(f"Master Pincode Database loaded ({len(master_df)} unique codes).")
-    
-    # 2. Loop through your files
-    for f in FILES_TO_CLEAN:
-        clean_file(f, master_df)
-        
-    print("\nAll files cleaned successfully. 🚀")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Geotag and normalise the merged datasets.")
+    parser.add_argument("files", nargs='*', default=FILES_TO_CLEAN,
+                        help="Merged files to clean (default: FILES_TO_CLEAN)")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help=f"Pieces cleaned in parallel (default: {WORKERS})")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help=f"Rows per chunk / piece (default: {CHUNK_ROWS:,})")
+    args = parser.parse_args()
+
+    # 1. Load Master Key (once; the workers share its lookup arrays)
+    lookup = load_master_lookup(PINCODE_MASTER_FILE)
+    print(f"Master Pincode Database loaded ({int((lookup.state_codes != -1).sum()):,} unique codes).")
+
+    # 2. Clean every file, pieces of all files in parallel
+    clean_files(args.files, lookup, workers=args.workers, chunk_rows=args.chunk_rows)
+
+    print("\nAll files cleaned successfully. 🚀")
@@ -0,0 +1,291 @@
+import io
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV-only mode: everything still works, just slower to reload
+    pa = None
+    pq = None
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Every stage output "X.csv" gets a typed, compressed twin "X.parquet".
+# The next stage loads the Parquet file instead of re-parsing the CSV text.
+PARQUET_SUFFIX = ".parquet"
+COMPRESSION = "zstd"
+
+# Raw UIDAI dates look like "02-03-2025" (day first)
+DATE_FORMAT = "%d-%m-%Y"
+
+
+def parquet_available():
+    return pq is not None
+
+
+def columnar_path(csv_path):
+    """'Cleaned_Final_Monthly_Data_Combined.csv' -> 'Cleaned_Final_Monthly_Data_Combined.parquet'"""
+    root, _ = os.path.splitext(csv_path)
+    return root + PARQUET_SUFFIX
+
+
+# A twin is either one Parquet file or, for outputs that grow by appending
+# (the merges), a directory of part files read in name order as one table.
+def parquet_files(parquet_path):
+    """The Parquet file(s) making up a twin, in table order ([] if there is none)."""
+    if os.path.isdir(parquet_path):
+        return [os.path.join(parquet_path, name) for name in sorted(os.listdir(parquet_path))
+                if name.endswith(PARQUET_SUFFIX)]
+    return [parquet_path] if os.path.exists(parquet_path) else []
+
+
+def columnar_mtime(parquet_path):
+    """Last modification of a twin (its newest part, for a directory); 0 if there is none."""
+    paths = parquet_files(parquet_path) + ([parquet_path] if os.path.isdir(parquet_path) else [])
+    return max((os.path.getmtime(p) for p in paths), default=0)
+
+
+def parquet_schema(parquet_path):
+    return pq.read_schema(parquet_files(parquet_path)[0])
+
+
+# ==========================================
+# 1. TYPING
+# ==========================================
+def _is_count_column(name):
+    # age_0_5, bio_age_17_, demo_age_5_17, ...
+    name = name.lower()
+    return name.startswith(('age_', 'bio_age_', 'demo_age_'))
+
+
+def parse_dates(values):
+    """
+    Day-first dates to datetime64. The usual "02-03-2025" takes the fast fixed
+    format; anything else ("01/03/2025", ISO dates from another export) is parsed
+    day-first as before. Values that are still not dates become NaT, with a warning.
+    """
+    dates = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    values = pd.Series(values, copy=False)
+    missed = values[dates.isna() & values.notna()].astype(str).str.strip()
+    missed = missed[missed != '']
+    if len(missed):
+        retried = pd.to_datetime(missed, format='mixed', dayfirst=True, errors='coerce')
+        dates = dates.copy()
+        dates[missed.index] = retried
+        bad = retried.isna()
+        if bad.any():
+            print(f"  Warning: {int(bad.sum()):,} date value(s) could not be parsed "
+                  f"(e.g. {missed[bad].iloc[0]!r}) and become NaT")
+    return dates
+
+
+def to_typed_frame(df):
+    """
+    Converts a text chunk (as read from the CSVs) into proper column types:
+    date -> datetime, pincode -> nullable integer, age counts -> integers
+    (blank counts become 0, as the analysis scripts already assumed),
+    everything else -> string.
+    The conversion depends only on the column names, so every chunk of a file
+    gets the same schema.
+    """
+    typed = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        lower = col.lower()
+        if lower == 'date':
+            typed[col] = parse_dates(df[col])
+        elif lower == 'pincode':
+            # "500001.0" and "500001" both become 500001; junk becomes <NA>
+            typed[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+        elif _is_count_column(col):
+            typed[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).round().astype('int64')
+        elif lower in ('latitude', 'longitude'):
+            typed[col] = pd.to_numeric(df[col], errors='coerce')
+        else:
+            typed[col] = df[col].astype('string')
+    return typed
+
+
+# ==========================================
+# 2. WRITING
+# ==========================================
+class ParquetChunkWriter:
+    """
+    Appends DataFrame chunks to one Parquet file. The schema is fixed by the
+    first chunk. Does nothing if pyarrow is not installed.
+
+        with ParquetChunkWriter("out.parquet") as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = path + ".part"
+        self.schema = None
+        self._writer = None
+
+    def write(self, df):
+        if pq is None:
+            return
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = pq.ParquetWriter(self.temp_path, self.schema, compression=COMPRESSION)
+        self._writer.write_table(table)
+
+    def append_file(self, path, batch_size=200_000):
+        """Copies another Parquet file (same columns) onto the end, batch by batch."""
+        if pq is None:
+            return
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            table = pa.Table.from_batches([batch])
+            if self._writer is None:
+                self.schema = table.schema
+                self._writer = pq.ParquetWriter(self.temp_path, self.schema, compression=COMPRESSION)
+            self._writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            if os.path.isdir(self.path):
+                # Overwriting a twin that merge_engine.py wrote as a directory of parts
+                shutil.rmtree(self.path)
+            os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_parquet(df, path):
+    """One-shot version of ParquetChunkWriter for frames already in memory."""
+    with ParquetChunkWriter(path) as writer:
+        writer.write(df)
+
+
+# ==========================================
+# 3. LOADING
+# ==========================================
+def columnar_is_fresh(csv_path):
+    """True if the Parquet twin of `csv_path` exists and is at least as new as the CSV."""
+    parquet_file = columnar_path(csv_path)
+    return (
+        pq is not None
+        and bool(parquet_files(parquet_file))
+        and (not os.path.exists(csv_path) or columnar_mtime(parquet_file) >= os.path.getmtime(csv_path))
+    )
+
+
+def load_table(csv_path, columns=None):
+    """
+    Loads a stage output. Uses the Parquet twin when it exists and is at least
+    as new as the CSV; otherwise falls back to parsing the CSV.
+    `columns` (optional) limits which columns are read.
+    """
+    parquet_file = columnar_path(csv_path)
+    if columnar_is_fresh(csv_path):
+        print(f"  Loading {parquet_file} (columnar)")
+        return pd.read_parquet(parquet_file, columns=columns)
+
+    print(f"  Loading {csv_path} (CSV)")
+    df = pd.read_csv(csv_path, usecols=columns, dtype=str)
+    return to_typed_frame(df)
+
+
+def iter_table(csv_path, chunk_rows=200_000, columns=None, piece=None, quiet=False):
+    """
+    Streaming version of load_table(): yields typed chunks of at most
+    `chunk_rows` rows, so a stage can process files larger than memory.
+    `piece` (from split_table()) limits the read to part of the file.
+    """
+    parquet_file = columnar_path(csv_path)
+    if isinstance(piece, list) or (piece is None and columnar_is_fresh(csv_path)):
+        if not quiet:
+            print(f"  Streaming {parquet_file} (columnar, {chunk_rows:,} rows per chunk)")
+        # Row groups are numbered across all part files in order
+        first = 0
+        for path in parquet_files(parquet_file):
+            parquet = pq.ParquetFile(path)
+            count = parquet.metadata.num_row_groups
+            local = None if piece is None else [g - first for g in piece if first <= g < first + count]
+            first += count
+            if local == []:
+                continue
+            for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns, row_groups=local):
+                yield batch.to_pandas()
+        return
+
+    if not quiet:
+        print(f"  Streaming {csv_path} (CSV, {chunk_rows:,} rows per chunk)")
+    source = csv_path
+    if piece is not None:
+        # A byte range of whole lines: parsed with the file's header in front
+        start, end = piece
+        with open(csv_path, 'rb') as f:
+            header = f.readline()
+            f.seek(start)
+            source = io.BytesIO(header + f.read(end - start))
+    for chunk in pd.read_csv(source, usecols=columns, dtype=str, chunksize=chunk_rows):
+        yield to_typed_frame(chunk)
+
+
+def _split_csv(csv_path, chunk_rows, sample_bytes=1 << 16):
+    """(start, end) byte ranges of about `chunk_rows` lines each, cut at line ends, after the header."""
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        start = f.tell()
+        sample = f.read(sample_bytes)
+        # Row length estimated from the first lines; pieces only need to be roughly even
+        step = max(1, chunk_rows * len(sample) // max(sample.count(b"\n"), 1))
+        pieces = []
+        while start < size:
+            f.seek(min(start + step, size))
+            f.readline()
+            end = min(f.tell(), size)
+            pieces.append((start, end))
+            start = end
+    return pieces or [None]
+
+
+def split_table(csv_path, chunk_rows=200_000):
+    """
+    Splits a stage output into pieces of roughly `chunk_rows` rows that can be
+    read independently (e.g. by different worker processes) with
+    iter_table(piece=...): lists of Parquet row groups, or, without a fresh
+    Parquet file, byte ranges of the CSV cut at line ends (the stage outputs
+    never have line breaks inside a value).
+    """
+    if not columnar_is_fresh(csv_path):
+        return _split_csv(csv_path, chunk_rows)
+
+    sizes = []   # rows per row group, all part files in order
+    for path in parquet_files(columnar_path(csv_path)):
+        metadata = pq.ParquetFile(path).metadata
+        sizes += [metadata.row_group(g).num_rows for g in range(metadata.num_row_groups)]
+    pieces, current, rows = [], [], 0
+    for i, size in enumerate(sizes):
+        current.append(i)
+        rows += size
+        if rows >= chunk_rows:
+            pieces.append(current)
+            current, rows = [], 0
+    if current or not pieces:
+        pieces.append(current)
+    return pieces
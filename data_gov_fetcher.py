@@ -0,0 +1,525 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+
+import aiohttp
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Point DATA_GOV_API_URL at a local stand-in (see mock_data_gov_server.py) to test without the real API
+BASE_URL = os.environ.get("DATA_GOV_API_URL", "https://api.data.gov.in/resource")
+
+PAGE_SIZE = 1000       # Rows per request
+TIMEOUT = 30           # Seconds per request
+
+# Requests in flight are not a fixed guess: they start at CONCURRENCY and adapt
+# (additive increase, multiplicative decrease) to what the server tolerates.
+# +1 after every window of fast, successful responses; x DECREASE_FACTOR on a
+# 429/5xx/timeout, or when latency climbs past LATENCY_FACTOR x the best seen.
+CONCURRENCY = 4        # Starting point
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32   # Also the size of the connection pool
+DECREASE_FACTOR = 0.5
+LATENCY_FACTOR = 2.5
+SLOW_LATENCY_FLOOR = 0.5   # Seconds; faster responses never count as slow (jitter on a fast link)
+RATE_PER_SEC = None    # Optional hard cap on requests started per second (None: no cap)
+
+# Failed pages are retried with jittered exponential backoff: a random wait of
+# up to BACKOFF_BASE * 2^(attempt-1) seconds (capped), or the server's Retry-After
+MAX_RETRIES = 8        # Attempts per page before the run stops (it can be resumed)
+BACKOFF_BASE = 1
+BACKOFF_CAP = 60
+
+# Every output "X.csv" has a checkpoint "X.csv.checkpoint.json" recording which
+# offsets are already in the file, so an interrupted download resumes exactly
+# where it stopped.
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+# Pages are written in offset order. A page that arrives before an earlier one
+# waits in memory; no offset more than REORDER_FACTOR x max_concurrency pages
+# (the reorder window, set per fetch) past the oldest missing page is
+# requested, so at most that many pages are ever held.
+REORDER_FACTOR = 2
+
+
+class FetchError(Exception):
+    pass
+
+
+# ==========================================
+# 1. RATE AND CONCURRENCY LIMITS
+# ==========================================
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimit:
+    """
+    AIMD limit on requests in flight. A request takes a slot with acquire() and
+    reports how it went with release(). After `limit` good responses in a row the
+    limit grows by one; an error or a slow response cuts it by DECREASE_FACTOR,
+    at most once per round trip (responses to requests sent before the last cut
+    do not cut it again), so one burst of 429s counts as one signal.
+    """
+
+    def __init__(self, initial=CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+        self.sent = 0
+        self.last_cut = 0
+        self.good = 0
+        self.best_latency = None
+        self.latency = None   # Moving average
+        self.cuts = 0
+        self.last_good = 0    # Ticket of the latest request that succeeded
+        self.changed = asyncio.Condition()
+
+    async def acquire(self):
+        """Waits for a free slot; returns a ticket to pass to release()."""
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            self.sent += 1
+            return self.sent
+
+    async def release(self, ticket, ok, latency=None):
+        """ok: True/False for a good/failed response, None if the request was never sent."""
+        async with self.changed:
+            self.in_flight -= 1
+            self.changed.notify_all()
+            if ok is None:
+                return
+            slow = False
+            if ok and latency is not None:
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+                slow = self.latency > max(LATENCY_FACTOR * self.best_latency, SLOW_LATENCY_FLOOR)
+
+            if ok:
+                self.last_good = max(self.last_good, ticket)
+            if ok and not slow:
+                self.good += 1
+                if self.good >= int(self.limit) and self.limit < self.maximum:
+                    self.good = 0
+                    self._set(self.limit + 1, "responses ok")
+            elif ticket > self.last_cut:
+                self.good = 0
+                self.last_cut = self.sent
+                self.cuts += self.limit > self.minimum
+                if slow:
+                    # Forget the old average, or the next response would look slow too
+                    self.latency = None
+                self._set(max(self.minimum, self.limit * DECREASE_FACTOR), "slow responses" if slow else "errors")
+
+    async def backoff(self, delay):
+        """
+        Sleeps up to `delay` seconds, but wakes early once a request sent after
+        this call succeeds: the server has recovered, and the limit (cut to its
+        minimum by the failures) now paces the retries instead of the timers.
+        Without that, one page left in a long backoff would hold up every page
+        behind it in the ordered output.
+        """
+        since = self.sent
+        async with self.changed:
+            try:
+                await asyncio.wait_for(self.changed.wait_for(lambda: self.last_good > since), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _set(self, limit, reason):
+        if int(limit) != int(self.limit):
+            print(f"  [concurrency {int(self.limit)} -> {int(limit)}: {reason}]")
+        self.limit = limit
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before retry `attempt` + 1: full jitter, at least the server's Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, min(BACKOFF_CAP, retry_after))
+    return delay
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+# ==========================================
+# 2. THE CHECKPOINT
+# ==========================================
+def _job_key(resource_id, filters):
+    """'<resource>/*' for the whole resource, else e.g. '<resource>/state=Goa'."""
+    if not filters:
+        return f"{resource_id}/*"
+    return f"{resource_id}/" + "&".join(f"{k}={v}" for k, v in sorted(filters.items()))
+
+
+class Checkpoint:
+    """
+    What is already in the output file:
+      header - the column names (written once, at the top),
+      bytes  - the file size after the last recorded page (anything after it is
+               a page that was being written when the run died, and is cut off),
+      jobs   - per resource and filter, the row ranges [start, end) already written
+               and, once seen, the offset where the data ends. A page is only
+               written if its offset is outside these ranges, so none is written twice.
+    """
+
+    def __init__(self, output_file):
+        self.path = output_file + CHECKPOINT_SUFFIX
+        self.data = {'header': None, 'bytes': 0, 'jobs': {}}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    def job(self, key):
+        return self.data['jobs'].setdefault(key, {'done': [], 'end': None})
+
+    def is_done(self, key, offset):
+        return any(start <= offset < end for start, end in self.job(key)['done'])
+
+    def next_missing(self, key, offset):
+        """The first offset from `offset` on that is not written yet."""
+        for start, end in self.job(key)['done']:
+            if start <= offset < end:
+                return end
+        return offset
+
+    def add(self, key, start, end, file_bytes):
+        """Records rows [start, end) of job `key` as written; the file is now `file_bytes` long."""
+        ranges = sorted(self.job(key)['done'] + [[start, end]])
+        merged = []
+        for lo, hi in ranges:
+            if merged and lo <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        self.job(key)['done'] = merged
+        self.data['bytes'] = file_bytes
+        self.save()
+
+    def set_end(self, key, end):
+        job = self.job(key)
+        job['end'] = end if job['end'] is None else min(job['end'], end)
+        self.save()
+
+    def complete(self, key, start_offset):
+        """True if every page from `start_offset` to the known end is written."""
+        job = self.job(key)
+        if job['end'] is None:
+            return False
+        return any(lo <= start_offset and hi >= job['end'] for lo, hi in job['done']) or start_offset >= job['end']
+
+    def save(self):
+        with open(self.path + ".part", 'w', encoding='utf-8') as f:
+            json.dump(self.data, f)
+        os.replace(self.path + ".part", self.path)
+
+
+# ==========================================
+# 3. FETCH ONE PAGE
+# ==========================================
+async def fetch_page(session, bucket, limiter, url, params, needed=None):
+    """
+    One page as raw CSV bytes (b'' once past the end of the data).
+    Takes a slot from `limiter` for the request itself (not for the backoff
+    wait), and retries 429s, server errors and timeouts with jittered
+    exponential backoff; raises FetchError when it gives up.
+    `needed()`, if given, is asked again just before sending; once it returns
+    False (the end of the data turned up meanwhile) b'' is returned unsent.
+    """
+    for attempt in range(1, MAX_RETRIES + 1):
+        if bucket is not None:
+            await bucket.acquire()
+        ticket = await limiter.acquire()
+        if needed is not None and not needed():
+            await limiter.release(ticket, None)
+            return b""
+        started = time.monotonic()
+        retry_after = None
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status in (200, 400, 404):
+                    # 400/404 is the API's way of saying "no more data"
+                    content = await response.read() if response.status == 200 else b""
+                    await limiter.release(ticket, True, time.monotonic() - started)
+                    return content
+                error = f"HTTP {response.status}"
+                retry_after = _retry_after(response)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = f"{type(e).__name__}: {e}"
+        await limiter.release(ticket, False)
+
+        print(f"  [Attempt {attempt}/{MAX_RETRIES}] offset {params['offset']}: {error}")
+        if attempt < MAX_RETRIES:
+            if retry_after is not None:
+                await asyncio.sleep(backoff_delay(attempt, retry_after))  # as the server asked
+            else:
+                await limiter.backoff(backoff_delay(attempt))
+    raise FetchError(f"offset {params['offset']} failed after {MAX_RETRIES} attempts")
+
+
+class Page:
+    """
+    A raw CSV page split into its header and its data lines, without parsing
+    the values: the bytes are appended to the output as served.
+    """
+
+    def __init__(self, content):
+        header_line, _, body = content.partition(b"\n")
+        self.header = next(csv.reader([header_line.decode('utf-8').strip()]), [])
+        if b'"' in body:
+            # Quoted values may hold commas or line breaks: count fields with the csv module
+            records = [r for r in csv.reader(io.StringIO(body.decode('utf-8'), newline='')) if r]
+            self.widths = {len(r) for r in records}
+            self.rows = len(records)
+            self.body = body if body.endswith(b"\n") else body + b"\n"
+        else:
+            # The common case: one row per line, fields = commas + 1
+            lines = [line for line in body.splitlines() if line]
+            self.widths = {line.count(b",") + 1 for line in lines}
+            self.rows = len(lines)
+            self.body = b"\n".join(lines) + b"\n" if lines else b""
+        self.content = content
+
+    def check(self, offset):
+        """Raises FetchError unless every row has as many fields as the header."""
+        if self.widths - {len(self.header)}:
+            raise FetchError(f"offset {offset}: rows with {sorted(self.widths)} fields "
+                             f"under a header of {len(self.header)} columns")
+
+    def validate(self, offset):
+        """Full pandas parse of the page (the --validate mode): the same columns and row count."""
+        df = pd.read_csv(io.BytesIO(self.content), dtype=str, keep_default_na=False)
+        if list(df.columns) != self.header or len(df) != self.rows:
+            raise FetchError(f"offset {offset}: pandas read {len(df)} rows x {list(df.columns)}, "
+                             f"the line scan {self.rows} rows x {self.header}")
+
+    def reshaped(self, rename, header):
+        """
+        The data lines re-ordered to `header` (renamed columns first). Only needed when a
+        page comes back with different columns than the file started with, so this one
+        parses and re-serializes.
+        """
+        df = pd.read_csv(io.BytesIO(self.content), dtype=str, keep_default_na=False)
+        df = df.rename(columns=rename or {}).reindex(columns=header, fill_value="")
+        return df.to_csv(index=False, header=False).encode('utf-8')
+
+
+def _header_line(columns):
+    line = io.StringIO()
+    csv.writer(line, lineterminator="\n").writerow(columns)
+    return line.getvalue().encode('utf-8')
+
+
+# ==========================================
+# 4. FETCH A RESOURCE
+# ==========================================
+async def _fetch_job(session, bucket, limiter, out, checkpoint, resource_id, api_key, filters, page_size,
+                     start_offset, rename, validate, reorder_window):
+    key = _job_key(resource_id, filters)
+    url = f"{BASE_URL}/{resource_id}"
+    base_params = {'api-key': api_key, 'format': 'csv', 'limit': page_size}
+    for column, value in (filters or {}).items():
+        base_params[f'filters[{column}]'] = value
+
+    if checkpoint.complete(key, start_offset):
+        print(f"  {key}: already complete")
+        return 0
+
+    # Requests go out for next_offset, next_offset + page_size, ...; pages are
+    # written strictly from commit_offset on, as soon as they are contiguous
+    commit_offset = next_offset = checkpoint.next_missing(key, start_offset)
+    pending = {}   # offset -> Page fetched ahead of commit_offset (the reorder buffer)
+    moved = asyncio.Condition()
+    rows_written = 0
+    data_end = None  # Where a short page says the data ends, before that page is written
+
+    def finished(offset):
+        ends = [end for end in (checkpoint.job(key)['end'], data_end) if end is not None]
+        return bool(ends) and offset >= min(ends)
+
+    async def claim():
+        nonlocal next_offset
+        async with moved:
+            # Bounded reorder buffer: don't run more than reorder_window pages ahead of the oldest missing one
+            await moved.wait_for(lambda: finished(next_offset)
+                                 or next_offset < commit_offset + reorder_window * page_size)
+            if finished(next_offset):
+                return None
+            offset = next_offset
+            next_offset = checkpoint.next_missing(key, offset + page_size)
+            return offset
+
+    def write(page):
+        columns = [(rename or {}).get(c, c) for c in page.header]
+        if checkpoint.data['header'] is None:
+            checkpoint.data['header'] = columns
+            out.write(_header_line(columns))
+        # The page's own header line is dropped; its data lines are appended as served
+        if columns == checkpoint.data['header']:
+            out.write(page.body)
+        else:
+            out.write(page.reshaped(rename, checkpoint.data['header']))
+        out.flush()
+
+    def commit_ready():
+        """Writes every page that is now next in line. Returns when a gap is reached."""
+        nonlocal commit_offset, rows_written
+        while commit_offset in pending and not finished(commit_offset):
+            offset = commit_offset
+            page = pending.pop(offset)
+            if page.rows:
+                write(page)
+                checkpoint.add(key, offset, offset + page.rows, out.tell())
+                rows_written += page.rows
+                print(f"  {key}: saved {page.rows} rows (offset {offset})")
+            if page.rows < page_size:
+                checkpoint.set_end(key, offset + page.rows)
+            commit_offset = checkpoint.next_missing(key, offset + page_size)
+        if finished(commit_offset):
+            if checkpoint.job(key)['end'] is None:
+                checkpoint.set_end(key, data_end)  # an empty page right after the last full one
+            pending.clear()  # pages fetched past the end of the data
+
+    async def worker():
+        nonlocal data_end
+        while True:
+            offset = await claim()
+            if offset is None:
+                return
+            page = Page(await fetch_page(session, bucket, limiter, url, dict(base_params, offset=offset),
+                                         needed=lambda: not finished(offset)))
+            if page.rows:
+                page.check(offset)
+                if validate:
+                    page.validate(offset)
+            async with moved:
+                if page.rows < page_size:
+                    data_end = offset + page.rows if data_end is None else min(data_end, offset + page.rows)
+                pending[offset] = page
+                commit_ready()
+                moved.notify_all()
+
+    # One worker per possible slot; the limiter decides how many actually send
+    await asyncio.gather(*(worker() for _ in range(limiter.maximum)))
+    print(f"  {key}: complete ({rows_written:,} new rows)")
+    return rows_written
+
+
+async def fetch_resource_async(resource_id, output_file, api_key, filters_list=None, page_size=PAGE_SIZE,
+                               concurrency=CONCURRENCY, max_concurrency=MAX_CONCURRENCY, rate=RATE_PER_SEC,
+                               start_offset=0, rename=None, fresh=False, validate=False):
+    """
+    Downloads every page of a data.gov.in resource into one CSV (header once),
+    in offset order, each page exactly once.
+    `filters_list` is a list of filter dicts (e.g. [{'state': 'Goa'}, ...]),
+    fetched one after another into the same file; None fetches the whole resource.
+    Requests in flight start at `concurrency` and adapt up to `max_concurrency`;
+    `rate` optionally caps requests started per second.
+    Pages are appended as raw bytes (header line dropped, field counts checked);
+    `validate=True` also parses every page with pandas as a cross-check.
+    Progress is checkpointed after every page, so re-running after a crash
+    fetches only what is missing. `fresh=True` discards the checkpoint and the file.
+    Returns the number of rows written by this run.
+    """
+    checkpoint_file = output_file + CHECKPOINT_SUFFIX
+    if fresh:
+        for path in (output_file, checkpoint_file):
+            if os.path.exists(path):
+                os.remove(path)
+    elif os.path.exists(output_file) and not os.path.exists(checkpoint_file):
+        raise FetchError(f"{output_file} exists but has no checkpoint; "
+                         f"move it away or re-run with fresh=True (--fresh) to start over")
+
+    checkpoint = Checkpoint(output_file)
+    print(f"Fetching {resource_id} -> {output_file} ({concurrency} in flight to start, up to "
+          f"{max_concurrency}, {f'{rate} requests/s max' if rate else 'no rate cap'}, {page_size} rows per page)")
+
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    # One pooled session: connections are opened once and kept alive for every page
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+    bucket = TokenBucket(rate) if rate else None
+    limiter = AdaptiveLimit(concurrency, maximum=max_concurrency)
+    total = 0
+    with open(output_file, 'ab') as out:
+        # Drop anything a crashed run wrote after its last recorded page
+        out.truncate(checkpoint.data['bytes'])
+        out.seek(checkpoint.data['bytes'])
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            for filters in filters_list or [None]:
+                total += await _fetch_job(session, bucket, limiter, out, checkpoint, resource_id, api_key,
+                                          filters, page_size, start_offset, rename, validate,
+                                          REORDER_FACTOR * max_concurrency)
+    print(f"Done: {total:,} new rows in {output_file} "
+          f"(concurrency ended at {int(limiter.limit)}, backed off {limiter.cuts} times)")
+    return total
+
+
+def fetch_resource(*args, **kwargs):
+    """Blocking wrapper around fetch_resource_async() for the download scripts."""
+    return asyncio.run(fetch_resource_async(*args, **kwargs))
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download a data.gov.in resource as one CSV, resumably.")
+    parser.add_argument("resource_id")
+    parser.add_argument("--output", required=True, help="CSV to write (resumed if it has a checkpoint)")
+    parser.add_argument("--api-key", default=os.environ.get("DATA_GOV_API_KEY"),
+                        help="data.gov.in API key (default: $DATA_GOV_API_KEY)")
+    parser.add_argument("--filter", action='append', default=[], metavar="COLUMN=VALUE",
+                        help="Only fetch matching rows, e.g. state=Goa (repeat for several filter values)")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help=f"Rows per request (default: {PAGE_SIZE})")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"Requests in flight to start with (default: {CONCURRENCY})")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY,
+                        help=f"Upper bound for the adaptive limit (default: {MAX_CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=RATE_PER_SEC,
+                        help="Hard cap on requests started per second (default: none)")
+    parser.add_argument("--start-offset", type=int, default=0, help="First row offset to fetch")
+    parser.add_argument("--fresh", action="store_true", help="Delete the output and its checkpoint first")
+    parser.add_argument("--validate", action="store_true",
+                        help="Also parse every page with pandas and stop on any mismatch (slower)")
+    args = parser.parse_args()
+
+    filters_list = [dict([item.split('=', 1)]) for item in args.filter] or None
+    try:
+        fetch_resource(args.resource_id, args.output, args.api_key, filters_list, page_size=args.page_size,
+                       concurrency=args.concurrency, max_concurrency=args.max_concurrency, rate=args.rate,
+                       start_offset=args.start_offset, fresh=args.fresh, validate=args.validate)
+    except FetchError as e:
+        print(f"CRITICAL: {e}")
+        print("Re-run the same command to resume.")
+        sys.exit(1)
@@ -0,0 +1,114 @@
+import pandas as pd
+
+from columnar_store import columnar_is_fresh, columnar_path, parquet_available, parquet_schema, parse_dates
+
+if parquet_available():
+    import pyarrow.parquet as pq
+
+# ==========================================
+# SCHEMA OF THE CLEANED DATASETS
+# ==========================================
+# Column names are normalised to lower case. 'Pincode' (as written by the clean
+# stage) becomes 'pincode'; older downloads that call the adult biometric
+# column 'bio_age_17+' are mapped onto 'bio_age_17_'.
+COLUMN_ALIASES = {
+    'bio_age_17+': 'bio_age_17_',
+    'demo_age_17+': 'demo_age_17_',
+}
+
+DATASETS = {
+    'enrolment': {
+        'file': "Cleaned_Final_Monthly_Data_Combined.csv",
+        'counts': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    },
+    'biometric': {
+        'file': "Cleaned_Final_Biometric_Data_Combined.csv",
+        'counts': ['bio_age_5_17', 'bio_age_17_'],
+    },
+    'demographic': {
+        'file': "Cleaned_Final_Demographic_Data_Combined.csv",
+        'counts': ['demo_age_5_17', 'demo_age_17_'],
+    },
+}
+
+# The two series the fraud detectors compare
+CHILD_ENROLMENT_COL = 'age_0_5'
+ADULT_BIOMETRIC_COL = 'bio_age_17_'
+
+# date   -> datetime64 (parsed once, day-first)
+# state / district -> category (a few hundred distinct names across millions of rows)
+# pincode -> uint32 (0 = unknown)
+# age counts -> int32
+CATEGORY_COLUMNS = ['state', 'district']
+
+
+def schema_columns(name):
+    return ['date', 'state', 'district', 'pincode'] + DATASETS[name]['counts']
+
+
+def _canonical(column):
+    lower = column.lower()
+    return COLUMN_ALIASES.get(lower, lower)
+
+
+def _apply_schema(df, counts):
+    for col in df.columns:
+        if col == 'date':
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = parse_dates(df[col])
+        elif col in CATEGORY_COLUMNS:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+            # Sorted, whichever file was read: Parquet dictionaries come in order of
+            # first appearance, and the weekly tables are laid out in category order
+            df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories))
+        elif col == 'pincode':
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('uint32')
+        elif col in counts:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int32')
+    return df
+
+
+# ==========================================
+# THE LOADER
+# ==========================================
+def load_dataset(name, columns=None, path=None):
+    """
+    Loads one of the cleaned datasets ('enrolment', 'biometric', 'demographic')
+    with declared types and lower-case column names.
+
+    `columns` limits what is read (e.g. ['date', 'state', 'district', 'age_0_5']);
+    unrequested columns are never parsed. `path` overrides the default file name.
+    Reads the Parquet twin when it is available and up to date, else the CSV.
+    """
+    spec = DATASETS[name]
+    csv_path = path or spec['file']
+    parquet_file = columnar_path(csv_path)
+    use_parquet = columnar_is_fresh(csv_path)
+
+    # Map the file's actual column names (any case / alias) onto the schema names
+    if use_parquet:
+        file_columns = parquet_schema(parquet_file).names
+    else:
+        file_columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    actual = {_canonical(c): c for c in file_columns}
+
+    wanted = columns or [c for c in schema_columns(name) if c in actual]
+    missing = [c for c in wanted if c not in actual]
+    if missing:
+        raise KeyError(f"{csv_path} has no column(s) {missing}. Available: {sorted(actual)}")
+    read_cols = [actual[c] for c in wanted]
+
+    if use_parquet:
+        print(f"  Loading {parquet_file} [{', '.join(wanted)}]")
+        # read_dictionary hands state/district over as categories without building millions of strings
+        table = pq.read_table(parquet_file, columns=read_cols,
+                              read_dictionary=[actual[c] for c in CATEGORY_COLUMNS if c in wanted])
+        df = table.to_pandas()
+    else:
+        print(f"  Loading {csv_path} [{', '.join(wanted)}]")
+        df = pd.read_csv(csv_path, usecols=read_cols, dtype=str)
+        df = df[read_cols]
+
+    df.columns = wanted
+    return _apply_schema(df, spec['counts'])
@@ -0,0 +1,187 @@
+import argparse
+import math
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import ParquetChunkWriter, columnar_path, parquet_available, to_typed_frame
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Rough ceiling on the memory the dedup may use, whatever the input size.
+MEMORY_BUDGET_MB = 512
+
+# pandas needs roughly this many bytes in memory per byte of CSV text (Python string objects)
+IN_MEMORY_EXPANSION = 6
+
+
+# ==========================================
+# 1. PLANNING
+# ==========================================
+def _avg_row_bytes(path, sample_bytes=1 << 16):
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    return max(1, len(sample) // max(1, sample.count(b'\n')))
+
+
+def _plan(inputs, memory_mb):
+    """
+    Picks how many rows to stream at a time and how many on-disk partitions to
+    use, so that neither a chunk nor one partition exceeds half the budget.
+    """
+    budget = memory_mb * 1024 * 1024 / 2
+    total_bytes = sum(os.path.getsize(f) for f in inputs)
+    row_bytes = _avg_row_bytes(inputs[0]) * IN_MEMORY_EXPANSION
+    chunk_rows = max(1_000, int(budget // row_bytes))
+    partitions = max(1, math.ceil(total_bytes * IN_MEMORY_EXPANSION / budget))
+    return chunk_rows, partitions
+
+
+def _read_chunks(inputs, header, chunk_rows):
+    """Yields (source_index, chunk) for every chunk of every input, aligned to `header`."""
+    for src, file in enumerate(inputs):
+        # dtype=str + keep_default_na=False: rows are compared (and written) exactly as in the file
+        for chunk in pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+            if list(chunk.columns) != header:
+                chunk = chunk.reindex(columns=header, fill_value="")
+            yield src, chunk
+
+
+def _resolve_key(header, key):
+    if not key:
+        return list(header)
+    by_lower = {c.lower(): c for c in header}
+    missing = [k for k in key if k.lower() not in by_lower]
+    if missing:
+        raise KeyError(f"Key column(s) {missing} not found. Available: {header}")
+    return [by_lower[k.lower()] for k in key]
+
+
+# ==========================================
+# 2. THE OUT-OF-CORE DEDUP
+# ==========================================
+def dedup_csv(inputs, output_file, key=None, memory_mb=MEMORY_BUDGET_MB, export_csv=True):
+    """
+    Removes duplicate rows from one or more CSVs (treated as one concatenated
+    table) without ever holding the whole table in memory:
+
+      1. stream the rows, hash the key columns and append each row's key to one
+         of N partition files on disk (same key -> same partition),
+      2. dedup each partition on its own (exact comparison of the key text, so
+         hash collisions cannot drop a row) and note the row numbers to drop,
+      3. stream the inputs again and write every row that was not dropped.
+
+    The first occurrence of each row is kept, in the original order.
+    `key` (e.g. ['date', 'pincode', 'bio_age_5_17', 'bio_age_17_']) dedups on
+    those columns only; by default whole rows must match.
+    Returns {input file: rows removed}.
+    """
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    header = list(pd.read_csv(inputs[0], dtype=str, nrows=0).columns)
+    key_cols = _resolve_key(header, key)
+    chunk_rows, partitions = _plan(inputs, memory_mb)
+
+    print(f"Deduplicating {len(inputs)} file(s) on {'all columns' if not key else key_cols}")
+    print(f"  Budget {memory_mb} MB -> {chunk_rows:,} rows per chunk, {partitions} partition(s)")
+
+    work_dir = tempfile.mkdtemp(prefix="dedup_", dir=os.path.dirname(os.path.abspath(output_file)))
+    part_path = lambda p: os.path.join(work_dir, f"{p:04d}.csv")
+
+    try:
+        # --- PASS 1: partition the keys by hash ---
+        total_rows = 0
+        rows_per_src = np.zeros(len(inputs), dtype=np.int64)
+        for src, chunk in _read_chunks(inputs, header, chunk_rows):
+            keys = chunk[key_cols].copy()
+            keys.insert(0, '_row', np.arange(total_rows, total_rows + len(chunk), dtype=np.int64))
+            keys.insert(1, '_src', src)
+
+            part = pd.util.hash_pandas_object(chunk[key_cols], index=False).to_numpy() % partitions
+            order = np.argsort(part, kind='stable')
+            bounds = np.searchsorted(part[order], np.arange(partitions + 1))
+            for p in range(partitions):
+                if bounds[p] < bounds[p + 1]:
+                    keys.iloc[order[bounds[p]:bounds[p + 1]]].to_csv(part_path(p), mode='a', header=False, index=False)
+
+            total_rows += len(chunk)
+            rows_per_src[src] += len(chunk)
+        print(f"  Pass 1: {total_rows:,} rows partitioned")
+
+        # --- PASS 2: dedup each partition ---
+        drop = []
+        removed_per_src = np.zeros(len(inputs), dtype=np.int64)
+        for p in range(partitions):
+            if not os.path.exists(part_path(p)):
+                continue
+            part_df = pd.read_csv(part_path(p), names=['_row', '_src'] + key_cols, keep_default_na=False,
+                                  dtype={'_row': np.int64, '_src': np.int64, **{c: str for c in key_cols}})
+            # Rows were appended in input order, so keep='first' keeps the earliest occurrence
+            dup = part_df.duplicated(subset=key_cols, keep='first').to_numpy()
+            drop.append(part_df['_row'].to_numpy()[dup])
+            removed_per_src += np.bincount(part_df['_src'].to_numpy()[dup], minlength=len(inputs))
+            os.remove(part_path(p))
+        drop_rows = np.sort(np.concatenate(drop)) if drop else np.empty(0, dtype=np.int64)
+        print(f"  Pass 2: {len(drop_rows):,} duplicate rows found")
+
+        # --- PASS 3: write the rows that survive ---
+        if not export_csv and not parquet_available():
+            export_csv = True
+        temp_file = output_file + ".part"
+        row = 0
+        with ParquetChunkWriter(columnar_path(output_file)) as columnar, \
+                open(temp_file if export_csv else os.devnull, 'w', newline='', encoding='utf-8') as out:
+            out.write(pd.DataFrame(columns=header).to_csv(index=False))
+            for _, chunk in _read_chunks(inputs, header, chunk_rows):
+                lo, hi = np.searchsorted(drop_rows, [row, row + len(chunk)])
+                keep = np.ones(len(chunk), dtype=bool)
+                keep[drop_rows[lo:hi] - row] = False
+                kept = chunk[keep]
+                kept.to_csv(out, index=False, header=False)
+                columnar.write(to_typed_frame(kept))
+                row += len(chunk)
+        if export_csv:
+            os.replace(temp_file, output_file)
+        elif os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("-" * 40)
+    for file, rows, removed in zip(inputs, rows_per_src, removed_per_src):
+        print(f"  [+] {os.path.basename(file)}: {rows:,} rows, {removed:,} duplicates removed")
+    print("-" * 40)
+    print(f"Original Row Count: {total_rows:,}")
+    print(f"Clean Row Count:    {total_rows - len(drop_rows):,}")
+    print(f"Duplicates Removed: {len(drop_rows):,}")
+    print(f"Saved to {output_file if export_csv else columnar_path(output_file)}")
+    return {file: int(removed) for file, removed in zip(inputs, removed_per_src)}
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove duplicate rows from large CSVs within a memory budget.")
+    parser.add_argument("inputs", nargs='+', help="CSV file(s) to dedup, treated as one table in the given order")
+    parser.add_argument("--output", required=True, help="Deduplicated CSV to write (plus its Parquet twin)")
+    parser.add_argument("--key", help="Comma-separated columns that identify a duplicate "
+                                      "(e.g. date,pincode,bio_age_5_17,bio_age_17_). Default: the whole row")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET_MB,
+                        help=f"Approximate memory budget (default: {MEMORY_BUDGET_MB})")
+    parser.add_argument("--no-csv", action="store_true", help="Only write the Parquet file")
+    args = parser.parse_args()
+
+    missing = [f for f in args.inputs if not os.path.exists(f)]
+    if missing:
+        print(f"File(s) not found: {missing}")
+        sys.exit(1)
+
+    dedup_csv(args.inputs, args.output, key=args.key.split(',') if args.key else None,
+              memory_mb=args.memory_mb, export_csv=not args.no_csv)
@@ -1,69 +1,51 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+from hybrid_ranking import BUFFER_SD, MIN_KIDS, safe_limit_matrix
+from weekly_aggregates import load_weekly_matrix
+
 # --- CONFIGURATION ---
 FILE_ENROL = "Cleaned_Final_Monthly_Data_Combined.csv"    
 FILE_UPDATE = "Cleaned_Final_Biometric_Data_Combined.csv" 
 OUTPUT_FOLDER = "Final_Fraud_Detection_Graphs"
+SPIKE_MARGIN = 1.1   # A spike must exceed the threshold by at least 10%
 
 if not os.path.exists(OUTPUT_FOLDER):
     os.makedirs(OUTPUT_FOLDER)
 
-# 1. LOAD DATA
+# 1. LOAD DATA & AGGREGATE
 print("Loading Data...")
-df_enrol = pd.read_csv(FILE_ENROL, dtype={'Pincode': str}, low_memory=False)
-df_update = pd.read_csv(FILE_UPDATE, dtype={'Pincode': str}, low_memory=False)
-
-df_enrol.columns = df_enrol.columns.str.lower()
-df_update.columns = df_update.columns.str.lower()
-
-adult_bio_col = [c for c in df_update.columns if '17' in c and '5' not in c][0]
+# Weekly state totals as state x week matrices, memory-mapped from the aggregate
+# store shared with the other detectors (see weekly_aggregates.py)
+weekly = load_weekly_matrix('state', FILE_ENROL, FILE_UPDATE)
 
-for df in [df_enrol, df_update]:
-    df['date'] = pd.to_datetime(df['date'], dayfirst=True, errors='coerce')
-    
-df_enrol = df_enrol.dropna(subset=['date'])
-df_update = df_update.dropna(subset=['date'])
+# 2. THRESHOLDS FOR EVERY STATE AND WEEK AT ONCE
+# Each state's series below is one row of the matrices
 
-# 2. AGGREGATE
-print("Aggregating...")
-grp_enrol = df_enrol.groupby(['state', pd.Grouper(key='date', freq='W-MON')])['age_0_5'].sum().reset_index()
-grp_update = df_update.groupby(['state', pd.Grouper(key='date', freq='W-MON')])[adult_bio_col].sum().reset_index()
+# --- REFINED LOGIC ---
+# 1. Ratio (Kids per Adult Update): the median finds the "Normal" relationship
+# 2. TIGHTER BUFFER (Requested Change): reduced from 1.5 SD to 0.5 SD.
+#    This brings the Green Line DOWN, closer to the real trend.
+# 3. Threshold = (Adults * Ratio) + Small Buffer, never below the state's
+#    10% quantile of kid counts (sanity check)
+limits = safe_limit_matrix(weekly)
 
-merged = pd.merge(grp_enrol, grp_update, on=['state', 'date'], how='inner')
-merged.rename(columns={'age_0_5': 'New_Kids', adult_bio_col: 'Adult_Updates'}, inplace=True)
+# Only SIGNIFICANT anomalies (ignore tiny blips): above the threshold by SPIKE_MARGIN
+with np.errstate(invalid='ignore'):
+    spikes = weekly.kids > limits * SPIKE_MARGIN
 
 # 3. GENERATE GRAPHS
-states = merged['state'].unique()
 sns.set_style("white") 
 
 print(f"Generating Stricter Graphs...")
 
-for state in states:
+for i, state in enumerate(weekly.entities['state']):
     try:
-        state_df = merged[merged['state'] == state].copy()
-        if state_df['New_Kids'].sum() < 50: continue
-
-        # --- REFINED LOGIC ---
-        
-        # 1. Calculate the Ratio (Kids per Adult Update)
-        # We use the median to find the "Normal" relationship
-        ratio = (state_df['New_Kids'] / state_df['Adult_Updates'].replace(0, 1)).median()
-        
-        # 2. TIGHTER BUFFER (Requested Change)
-        # Reduced from 1.5 SD to 0.5 SD. 
-        # This brings the Green Line DOWN, closer to the real trend.
-        safety_buffer = state_df['New_Kids'].std() * 0.5 
-        
-        # 3. Calculate Threshold
-        # Threshold = (Adults * Ratio) + Small Buffer
-        state_df['Safe_Limit'] = (state_df['Adult_Updates'] * ratio) + safety_buffer
-        
-        # Ensure the line is never below the absolute minimum kid count (sanity check)
-        min_floor = state_df['New_Kids'].quantile(0.1) 
-        state_df['Safe_Limit'] = state_df['Safe_Limit'].clip(lower=min_floor)
+        if weekly.kids[i].sum() < MIN_KIDS: continue
+        state_df = weekly.series(i, Safe_Limit=limits, Spike=spikes)
+        safety_buffer = state_df['New_Kids'].std() * BUFFER_SD   # places the annotation
 
         # --- VISUAL SCALING FIX ---
         
@@ -92,11 +74,7 @@ for state in states:
         ax2.fill_between(state_df['date'], state_df['Adult_Updates'], color='grey', alpha=0.15, label='Adult Updates (Volume)')
         
         # Highlight Fraud
-        anomalies = state_df[state_df['New_Kids'] > state_df['Safe_Limit']]
-        
-        # Only plot anomalies if they are SIGNIFICANT (ignore tiny blips)
-        # It must exceed the threshold by at least 10%
-        real_anomalies = anomalies[anomalies['New_Kids'] > (anomalies['Safe_Limit'] * 1.1)]
+        real_anomalies = state_df[state_df['Spike']]
         
         if not real_anomalies.empty:
             ax1.scatter(real_anomalies['date'], real_anomalies['New_Kids'], color='red', s=100, zorder=10, edgecolors='black')
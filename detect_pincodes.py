@@ -0,0 +1,66 @@
+import argparse
+import time
+
+import numpy as np
+
+from anomaly_model import CONTAMINATION, WORKERS, fit_scores, flag_anomalies
+from hybrid_ranking import MIN_KIDS, hybrid_scores, safe_limit_matrix
+from weekly_aggregates import load_weekly_matrix
+
+# --- CONFIGURATION ---
+# Fraud camps are local: a district total can hide one pincode's spike. This
+# runs the same hybrid detection as fwdusingai.py on every pincode-week at once.
+# Low-activity pincodes, which can never be ranked, are kept sparsely in the
+# store and never loaded (see SPARSE_LEVELS in weekly_aggregates.py).
+FILE_ENROL = "Cleaned_Final_Monthly_Data_Combined.csv"
+FILE_UPDATE = "Cleaned_Final_Biometric_Data_Combined.csv"
+HIT_LIST_FILE = "Pincode_Fraud_Hit_List.csv"
+TOP_N = 100
+
+parser = argparse.ArgumentParser(description="Rank pincodes by hybrid fraud severity.")
+parser.add_argument("--top", type=int, default=TOP_N, help=f"Pincodes in the hit-list (default: {TOP_N})")
+parser.add_argument("--no-ai", action="store_true", help="Rule only: every week above its Safe_Limit counts")
+parser.add_argument("--output", default=HIT_LIST_FILE, help=f"Hit-list file (default: {HIT_LIST_FILE})")
+args = parser.parse_args()
+
+# ==========================================
+# 1. LOAD (pincode x week matrices, memory-mapped)
+# ==========================================
+print("Loading Data...")
+started = time.monotonic()
+weekly = load_weekly_matrix('pincode', FILE_ENROL, FILE_UPDATE)
+pincodes, weeks = weekly.kids.shape
+print(f"  {pincodes:,} active pincodes x {weeks} weeks "
+      f"({(weekly.kids.nbytes + weekly.adults.nbytes + weekly.valid.nbytes) / 1e6:.0f} MB)")
+
+# ==========================================
+# 2. AI MODEL (every pincode-week, straight from the matrices)
+# ==========================================
+valid = np.asarray(weekly.valid)
+if args.no_ai:
+    ai_flags = True
+else:
+    print("Training AI Model on all pincode-weeks...")
+    kids = np.asarray(weekly.kids)[valid]
+    adults = np.asarray(weekly.adults)[valid]
+    # The same features as fwdusingai.py: New_Kids and kids per adult update
+    X = np.column_stack([kids, kids / np.where(adults == 0, 1, adults)]).astype(float)
+    ai_flags = np.zeros(valid.shape, dtype=bool)
+    ai_flags[valid] = flag_anomalies(fit_scores(X, n_jobs=WORKERS), CONTAMINATION)
+
+# ==========================================
+# 3. HYBRID RANKING (all pincodes at once)
+# ==========================================
+print("Ranking Pincodes by Hybrid Severity...")
+limits = safe_limit_matrix(weekly)
+score_df = hybrid_scores(weekly, limits, ai_flags, MIN_KIDS)
+score_df = score_df.sort_values(by='fraud_severity', ascending=False)
+top = score_df.head(args.top)
+top.to_csv(args.output, index=False)
+
+print("\n" + "="*60)
+print(f" PINCODE FRAUD HIT-LIST (TOP {min(20, len(top))} OF {len(score_df):,} FLAGGED PINCODES)")
+print("="*60)
+print(top.head(20)[['state', 'district', 'pincode', 'fraud_severity', 'anomaly_count']].to_string(index=False))
+print("="*60)
+print(f"Saved the top {len(top)} to {args.output} ({time.monotonic() - started:.1f}s)")
@@ -0,0 +1,57 @@
+import numpy as np
+
+from weekly_matrix import row_median, row_quantile, row_std
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# The "Green Line": New_Kids expected from the adult activity that week,
+#   Adult_Updates x median(New_Kids / Adult_Updates) + BUFFER_SD x std(New_Kids),
+# never below the FLOOR_QUANTILE of the entity's own New_Kids.
+BUFFER_SD = 0.5
+FLOOR_QUANTILE = 0.1
+
+# Entities with fewer New_Kids than this in total are noise and are not ranked
+MIN_KIDS = 50
+
+
+# ==========================================
+# 1. SAFE LIMIT (every entity and week at once)
+# ==========================================
+def safe_limit_matrix(m, buffer_sd=BUFFER_SD, floor_quantile=FLOOR_QUANTILE):
+    """
+    The Safe_Limit of every entity-week of a WeeklyMatrix, as one entity x week
+    matrix (NaN where the entity has no data that week). Entities with a single
+    week have no std, so no limit.
+    """
+    ratio = row_median(m.kids / np.where(m.adults == 0, 1, m.adults), m.valid)
+    buffer = row_std(m.kids, m.valid) * buffer_sd
+    floor = row_quantile(m.kids, m.valid, floor_quantile)
+    limits = np.maximum((m.adults * ratio[:, None]) + buffer[:, None], floor[:, None])
+    return np.where(m.valid, limits, np.nan)
+
+
+# ==========================================
+# 2. HYBRID SEVERITY
+# ==========================================
+def hybrid_scores(m, limits, ai_flags, min_kids=MIN_KIDS):
+    """
+    Per entity, the weeks above its Safe_Limit that the AI also flagged
+    (`ai_flags`, an entity x week bool matrix) and the sum of the "extra kids"
+    in them. Returns [<keys>, fraud_severity, anomaly_count] for the entities
+    with at least one such week, in entity order (unsorted).
+    """
+    # Noise Filter: skip entities with negligible activity
+    active = m.kids.sum(axis=1) >= min_kids
+
+    # It is ONLY a fraud spike if it is above the Green Line AND the AI says it's weird
+    with np.errstate(invalid='ignore'):
+        hits = active[:, None] & (m.kids > limits) & ai_flags
+    severity = np.where(hits, m.kids - limits, 0).sum(axis=1)
+    count = hits.sum(axis=1)
+
+    ranked = count > 0
+    scores = m.entities[ranked].reset_index(drop=True)
+    scores['fraud_severity'] = severity[ranked]
+    scores['anomaly_count'] = count[ranked]
+    return scores
@@ -0,0 +1,383 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from columnar_store import ParquetChunkWriter, columnar_path, parquet_available, parquet_files, to_typed_frame
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Rows held in memory at any one time. Peak memory depends on this number,
+# not on how many split files (or rows) are being merged.
+CHUNK_ROWS = 200_000
+
+# Split files parsed at the same time (one process each). 1 = no process pool.
+WORKERS = os.cpu_count() or 1
+
+# Every merged output keeps a record of the splits already in it ("<output>.manifest.json"),
+# so a re-run only parses and appends new splits.
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+# ==========================================
+# 1. FIND THE SPLIT FILES
+# ==========================================
+def _split_sort_key(path):
+    """
+    Orders split files by their row offsets instead of alphabetically.
+    'api_data_aadhar_biometric_500000_1000000.csv' must come before
+    'api_data_aadhar_biometric_1000000_1500000.csv'.
+    """
+    name = os.path.basename(path)
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def resolve_split_files(source):
+    """
+    Accepts a folder, a glob pattern (e.g. 'downloads/*_biometric_*.csv')
+    or an explicit list of paths and returns the split files in offset order.
+    """
+    if isinstance(source, (list, tuple)):
+        return list(source)
+
+    if os.path.isdir(source):
+        files = glob.glob(os.path.join(source, "*.csv"))
+    else:
+        files = glob.glob(source)
+
+    return sorted(files, key=_split_sort_key)
+
+
+# ==========================================
+# 2. THE MANIFEST OF INGESTED SPLITS
+# ==========================================
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _load_manifest(output_file, export_csv):
+    """Returns the manifest if it matches the outputs on disk, else None (= full rebuild)."""
+    manifest_file = output_file + MANIFEST_SUFFIX
+    if not os.path.exists(manifest_file):
+        return None
+
+    with open(manifest_file, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('export_csv') != export_csv:
+        print("  [!] CSV export setting changed since the last merge, rebuilding")
+        return None
+    if export_csv and (not os.path.exists(output_file) or os.path.getsize(output_file) < manifest['csv_bytes']):
+        print(f"  [!] {output_file} is missing or shorter than recorded, rebuilding")
+        return None
+    if parquet_available() and not os.path.exists(columnar_path(output_file)):
+        print(f"  [!] {columnar_path(output_file)} is missing, rebuilding")
+        return None
+    return manifest
+
+
+def _remove_twin(parquet_path):
+    if os.path.isdir(parquet_path):
+        shutil.rmtree(parquet_path)
+    elif os.path.exists(parquet_path):
+        os.remove(parquet_path)
+
+
+def _prepare_parquet_dir(parquet_dir, manifest):
+    """
+    Makes the twin a directory holding exactly the parts the manifest records.
+    A twin written as a single file (older merges) becomes part 0; parts a
+    crashed run moved in after the last recorded merge are deleted.
+    """
+    if os.path.isfile(parquet_dir):
+        os.replace(parquet_dir, parquet_dir + ".old")
+        os.makedirs(parquet_dir)
+        os.replace(parquet_dir + ".old", os.path.join(parquet_dir, "part-00000.parquet"))
+        manifest['parquet_parts'] = 1
+    parts = parquet_files(parquet_dir)
+    manifest.setdefault('parquet_parts', len(parts))
+    for extra in parts[manifest['parquet_parts']:]:
+        os.remove(extra)
+
+
+def _save_manifest(output_file, manifest):
+    manifest_file = output_file + MANIFEST_SUFFIX
+    with open(manifest_file + ".part", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_file + ".part", manifest_file)
+
+
+def _check_ingested(found, manifest):
+    """
+    Compares the splits on disk with the manifest.
+    Returns (new_files, problems); `problems` lists ingested splits that changed or vanished.
+    """
+    ingested = {entry['name']: entry for entry in manifest['files']}
+    on_disk = {os.path.basename(file): file for file in found}
+    problems = []
+
+    for name, entry in ingested.items():
+        if name not in on_disk:
+            problems.append(f"{name} was merged before but is no longer in the source")
+            continue
+        stat = _file_stat(on_disk[name])
+        if stat == {'size': entry['size'], 'mtime': entry['mtime']}:
+            continue
+        # Touched but maybe not modified (copied, re-downloaded): the content hash decides
+        if stat['size'] != entry['size'] or file_sha256(on_disk[name]) != entry['sha256']:
+            problems.append(f"{name} has changed since it was merged")
+        else:
+            entry['mtime'] = stat['mtime']
+
+    new_files = [file for file in found if os.path.basename(file) not in ingested]
+    return new_files, problems
+
+
+# ==========================================
+# 3. PARSE ONE SPLIT (runs in a worker process)
+# ==========================================
+def _parse_split(task):
+    """
+    Streams one split file into its own part files (headerless CSV + Parquet),
+    aligned to the reference header. Returns its manifest entry plus a
+    'mismatch' flag for columns that had to be re-aligned.
+    """
+    file, header, part_stem, chunk_rows, export_csv = task
+    stat = _file_stat(file)
+    rows = 0
+    mismatch = False
+
+    with ParquetChunkWriter(part_stem + ".parquet") as columnar, \
+            open(part_stem + ".csv" if export_csv else os.devnull, 'w', newline='', encoding='utf-8') as out:
+        # dtype=str + keep_default_na=False copies every value through untouched
+        # (no "500001" -> "500001.0" surprises, no per-chunk type guessing)
+        reader = pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+        for chunk in reader:
+            if list(chunk.columns) != header:
+                mismatch = True
+                chunk = chunk.reindex(columns=header, fill_value="")
+            chunk.to_csv(out, index=False, header=False)
+            columnar.write(to_typed_frame(chunk))
+            rows += len(chunk)
+
+    return {
+        'name': os.path.basename(file),
+        'size': stat['size'],
+        'mtime': stat['mtime'],
+        'sha256': file_sha256(file),
+        'rows': rows,
+        'mismatch': mismatch,
+    }
+
+
+def _parse_all(tasks, workers):
+    """Yields each task's result in task (= file) order, parsing up to `workers` files at once."""
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _parse_split(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        # map() hands results back in submission order, whatever order the workers finish in
+        yield from executor.map(_parse_split, tasks)
+
+
+# ==========================================
+# 4. THE STREAMING MERGE
+# ==========================================
+def merge_split_files(source, output_file, chunk_rows=CHUNK_ROWS, export_csv=True, workers=1,
+                      incremental=True, on_change='refuse'):
+    """
+    Concatenates the split CSVs into one output, chunk by chunk.
+    The header is written once and every chunk is appended to the output,
+    so only `chunk_rows` rows per worker are ever in memory.
+
+    With workers > 1 the splits are parsed concurrently in a process pool; each
+    worker writes its own part files and the parts are appended in the original
+    file order, so the output is identical to a single-process run.
+
+    Alongside `output_file` a typed Parquet twin is written (see columnar_store.py)
+    which the clean stage loads instead of re-parsing the CSV. Set
+    export_csv=False to write only the Parquet file.
+
+    With incremental=True, splits listed in the output's manifest (size, mtime,
+    sha256) are not parsed again: only new splits are appended, after the ones
+    already merged. If an ingested split changed or disappeared the merge is
+    refused (on_change='refuse') or redone from scratch (on_change='rebuild').
+    Returns the number of rows in the output (None if nothing was merged).
+    """
+    file_paths = resolve_split_files(source)
+    print(f"Starting merge of {len(file_paths)} files ({workers} worker{'s' if workers != 1 else ''})...")
+
+    if not export_csv and not parquet_available():
+        print("  [!] pyarrow is not installed, writing CSV anyway")
+        export_csv = True
+
+    found = []
+    for file in file_paths:
+        if os.path.exists(file):
+            found.append(file)
+        else:
+            print(f"  [!] File not found: {file}")
+
+    if not found:
+        print("No data was loaded. Check your file paths.")
+        return None
+
+    manifest = _load_manifest(output_file, export_csv) if incremental else None
+    to_parse = found
+    if manifest is not None:
+        to_parse, problems = _check_ingested(found, manifest)
+        if problems:
+            for problem in problems:
+                print(f"  [!] {problem}")
+            if on_change != 'rebuild':
+                print("Merge refused: already-merged splits changed. Re-run with --on-change rebuild to start over.")
+                return None
+            print("  Rebuilding from scratch...")
+            manifest, to_parse = None, found
+
+    if manifest is not None:
+        print(f"  {len(manifest['files'])} splits already merged ({manifest['rows']:,} rows), {len(to_parse)} new")
+        if not to_parse:
+            _save_manifest(output_file, manifest)
+            print(f"{output_file} is up to date.")
+            return manifest['rows']
+        header = manifest['header']
+    else:
+        # Every split is aligned to the first file's columns
+        header = list(pd.read_csv(found[0], dtype=str, nrows=0).columns)
+        manifest = {'header': header, 'export_csv': export_csv, 'rows': 0, 'csv_bytes': 0, 'files': []}
+
+    # Workers write part files here; they are stitched together in order below
+    parts_dir = output_file + ".parts"
+    os.makedirs(parts_dir, exist_ok=True)
+    tasks = [
+        (file, header, os.path.join(parts_dir, f"{i:05d}"), chunk_rows, export_csv)
+        for i, file in enumerate(to_parse)
+    ]
+
+    appending = bool(manifest['files'])
+    temp_file = output_file + ".part"
+    total_rows = manifest['rows']
+    # The Parquet twin is a directory with one part file per merged split, so an
+    # update only writes the new splits' parts (see columnar_store.parquet_files)
+    parquet_dir = columnar_path(output_file)
+    staged_dir = parquet_dir if appending else parquet_dir + ".part"
+    new_parts = []
+
+    try:
+        if appending and export_csv:
+            # Drop anything a crashed run appended after the last recorded merge
+            with open(output_file, 'r+b') as out:
+                out.truncate(manifest['csv_bytes'])
+        if appending and parquet_available():
+            _prepare_parquet_dir(parquet_dir, manifest)
+        elif parquet_available():
+            shutil.rmtree(staged_dir, ignore_errors=True)
+            os.makedirs(staged_dir)
+
+        # New files are written to temporary names so a failed run never leaves a
+        # half-written output behind; when appending, the CSV is extended in place.
+        with open(os.devnull if not export_csv else output_file if appending else temp_file,
+                  'ab' if appending else 'wb') as out:
+            if not appending:
+                out.write(pd.DataFrame(columns=header).to_csv(index=False).encode('utf-8'))
+
+            for (file, _, part_stem, _, _), entry in zip(tasks, _parse_all(tasks, workers)):
+                if entry.pop('mismatch'):
+                    print(f"  [!] Column mismatch in {os.path.basename(file)}, aligned to first file's header")
+
+                if export_csv:
+                    with open(part_stem + ".csv", 'rb') as part:
+                        shutil.copyfileobj(part, out)
+                if os.path.exists(part_stem + ".parquet"):
+                    new_parts.append(part_stem + ".parquet")
+
+                manifest['files'].append(entry)
+                total_rows += entry['rows']
+                print(f"  [+] Merged: {os.path.basename(file)} ({entry['rows']:,} rows)")
+
+            out.flush()
+            csv_bytes = out.tell() if export_csv else 0
+
+        # The Parquet parts are moved in after the CSV is closed: load_table() only
+        # trusts a twin that is at least as new as its CSV
+        first = manifest.get('parquet_parts', 0) if appending else 0
+        for n, part in enumerate(new_parts, start=first):
+            os.replace(part, os.path.join(staged_dir, f"part-{n:05d}.parquet"))
+        if parquet_available():
+            os.utime(staged_dir)
+        manifest['parquet_parts'] = first + len(new_parts)
+
+    except Exception as e:
+        print(f"  [!] Error while merging: {e}")
+        if export_csv and not appending and os.path.exists(temp_file):
+            os.remove(temp_file)
+        if not appending:
+            shutil.rmtree(staged_dir, ignore_errors=True)
+        raise
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    if export_csv and not appending:
+        os.replace(temp_file, output_file)
+    if parquet_available() and not appending:
+        _remove_twin(parquet_dir)
+        os.replace(staged_dir, parquet_dir)
+
+    manifest['rows'] = total_rows
+    manifest['csv_bytes'] = csv_bytes
+    _save_manifest(output_file, manifest)
+
+    print("-" * 40)
+    print(f"Combined Total Rows: {total_rows:,}")
+    saved = [output_file] if export_csv else []
+    if parquet_available():
+        saved.append(columnar_path(output_file))
+    print(f"Saved to {' + '.join(saved)}. SUCCESS! File is ready.")
+    return total_rows
+
+
+# ==========================================
+# 5. COMMAND LINE (shared by the merge_*.py scripts)
+# ==========================================
+def merge_cli(split_files, output_file, description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--source", default=split_files,
+                        help=f"Folder or glob pattern of split CSVs (default: {split_files})")
+    parser.add_argument("--output", default=output_file, help=f"Merged CSV to write (default: {output_file})")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help=f"Split files parsed in parallel (default: {WORKERS})")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help=f"Rows per chunk held in memory by each worker (default: {CHUNK_ROWS:,})")
+    parser.add_argument("--no-csv", action="store_true", help="Only write the Parquet file")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Ignore the manifest and re-merge every split from scratch")
+    parser.add_argument("--on-change", choices=['refuse', 'rebuild'], default='refuse',
+                        help="What to do if an already-merged split has changed (default: refuse)")
+    args = parser.parse_args()
+
+    rows = merge_split_files(args.source, args.output, chunk_rows=args.chunk_rows,
+                             export_csv=not args.no_csv, workers=args.workers,
+                             incremental=not args.rebuild, on_change=args.on_change)
+    if rows is None:
+        sys.exit(1)
+    return rows
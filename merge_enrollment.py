@@ -1,52 +1,14 @@
-import pandas as pd
-import os
+from merge_engine import merge_cli
 
 # --- CONFIGURATION ---
+# Folder (or glob pattern) holding the split Enrolment downloads.
 # Using r"" (raw string) to handle Windows backslashes automatically
-file_paths = [
-    r"C:\Users\Raj\Downloads\api_data_aadhar_enrolment\api_data_aadhar_enrolment_0_500000.csv",
-    r"C:\Users\Raj\Downloads\api_data_aadhar_enrolment\api_data_aadhar_enrolment_500000_1000000.csv",
-    r"C:\Users\Raj\Downloads\api_data_aadhar_enrolment\api_data_aadhar_enrolment_1000000_1006029.csv"
-]
+SPLIT_FILES = r"C:\Users\Raj\Downloads\api_data_aadhar_enrolment"
 
 OUTPUT_FILE = "Final_Monthly_Data_Combined.csv"
 
 # --- EXECUTION ---
-dfs = []
-total_rows = 0
-
-print("Reading files...")
-
-for file in file_paths:
-    try:
-        # Check if file exists first
-        if os.path.exists(file):
-            # low_memory=False prevents warnings about mixed types (e.g. if column 5 has text and numbers)
-            df = pd.read_csv(file, low_memory=False)
-            dfs.append(df)
-            
-            count = len(df)
-            total_rows += count
-            print(f"  [+] Loaded: {os.path.basename(file)} ({count:,} rows)")
-        else:
-            print(f"  [!] File not found: {file}")
-            
-    except Exception as e:
-        print(f"  [!] Error reading {file}: {e}")
-
-if dfs:
-    print("-" * 40)
-    print("Merging dataframes...")
-    combined_df = pd.concat(dfs, ignore_index=True)
-    
-    print(f"Combined Total Rows: {len(combined_df):,}")
-    
-    # Optional: Deduplicate just in case
-    # combined_df.drop_duplicates(inplace=True)
-    # print(f"After Deduplication: {len(combined_df):,}")
-
-    print(f"Saving to {OUTPUT_FILE}...")
-    combined_df.to_csv(OUTPUT_FILE, index=False)
-    print("SUCCESS! File is ready.")
-else:
-    print("No data was loaded. Check your file paths.")
\ No newline at end of file
+# Files are streamed in chunks, so memory stays flat however many splits there are.
+# Splits are parsed in parallel: python merge_enrollment.py --workers 16
+if __name__ == "__main__":
+    merge_cli(SPLIT_FILES, OUTPUT_FILE, f"Merge the split Enrolment CSVs into {OUTPUT_FILE}.")
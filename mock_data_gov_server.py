@@ -0,0 +1,248 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# A local stand-in for api.data.gov.in: serves a CSV (or generated rows) page by
+# page, the way the real API does, so data_gov_fetcher.py can be tried offline:
+#
+#   python mock_data_gov_server.py --csv Final_Biometric_Data_Combined.csv --port 8765
+#   DATA_GOV_API_URL=http://127.0.0.1:8765/resource python data_gov_fetcher.py any-id --output out.csv
+#
+# It can also misbehave like an overloaded server (see Faults), and
+# `--fault-demo` runs the fetcher against it to show the adaptive concurrency
+# backing off and recovering.
+PORT = 8765
+
+
+def generated_rows(n):
+    """Deterministic rows shaped like the biometric resource."""
+    return pd.DataFrame({
+        'date': [f"{1 + i % 28:02d}-{1 + i // 28 % 12:02d}-2025" for i in range(n)],
+        'state': [['Goa', 'Assam', 'West Bengal', 'Uttar Pradesh'][i % 4] for i in range(n)],
+        'district': [['North Goa', 'Barpeta', 'Nadia', 'Agra'][i % 4] for i in range(n)],
+        'pincode': [str(400001 + i % 997) for i in range(n)],
+        'bio_age_5_17': [str(i % 13) for i in range(n)],
+        'bio_age_17_': [str(i % 29) for i in range(n)],
+    })
+
+
+class Faults:
+    """
+    How the stand-in misbehaves (all off by default):
+      capacity   - requests served at once; the rest queue, so latency grows with load,
+      queue      - requests allowed to wait beyond `capacity` before answering 429,
+      latency    - seconds to serve one page,
+      error_rate - share of requests answered with a random 503,
+      outage     - (start, seconds) after the server starts during which every request gets a 503.
+    """
+
+    def __init__(self, capacity=None, queue=0, latency=0.0, error_rate=0.0, outage=None, seed=0):
+        self.capacity = capacity
+        self.queue = queue
+        self.latency = latency
+        self.error_rate = error_rate
+        self.outage = outage
+        self.random = random.Random(seed)
+
+
+class MockState:
+    def __init__(self, table, faults=None):
+        self.table = table
+        self.faults = faults or Faults()
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.statuses = {}
+        self.active = 0
+        self.arrivals = []   # (seconds since start, requests already in the server)
+        self.started = time.monotonic()
+        self.slots = threading.Semaphore(self.faults.capacity) if self.faults.capacity else None
+
+    def admit(self):
+        """Status to answer with before serving: 200, or an injected 429/503."""
+        faults = self.faults
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic() - self.started
+            self.arrivals.append((now, self.active))
+            if faults.outage and faults.outage[0] <= now < faults.outage[0] + faults.outage[1]:
+                return 503
+            if faults.error_rate and faults.random.random() < faults.error_rate:
+                return 503
+            if faults.capacity and self.active >= faults.capacity + faults.queue:
+                return 429
+            self.active += 1
+            return 200
+
+    def serve(self, make_body):
+        """Runs make_body() in one of the `capacity` slots, taking `latency` seconds."""
+        try:
+            if self.slots:
+                self.slots.acquire()
+            try:
+                time.sleep(self.faults.latency)
+                return make_body()
+            finally:
+                if self.slots:
+                    self.slots.release()
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps the connection open between requests, like the real API
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not url.path.startswith("/resource/"):
+                return self._send(404, b"")
+            status = state.admit()
+            if status != 200:
+                return self._send(status, b"")
+            self._send(200, state.serve(lambda: self._page(url)))
+
+        def _page(self, url):
+
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            offset = int(query.get('offset', 0))
+            limit = int(query.get('limit', 10))
+
+            table = state.table
+            for key, value in query.items():
+                if key.startswith('filters[') and key.endswith(']'):
+                    column = key[len('filters['):-1]
+                    if column in table:
+                        table = table[table[column] == value]
+
+            page = table.iloc[offset:offset + limit]
+            # Past the end the real API answers with just the header
+            return page.to_csv(index=False).encode('utf-8')
+
+        def _send(self, status, body):
+            with state.lock:
+                state.statuses[status] = state.statuses.get(status, 0) + 1
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # one line per request would drown the fetcher's output
+
+    return Handler
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog (5) pushes a burst of new connections into a 1 s SYN retry
+    request_queue_size = 128
+
+
+def start_server(table, port=PORT, faults=None):
+    """Starts the stand-in in a background thread. Returns (server, state); call server.shutdown() to stop."""
+    state = MockState(table, faults)
+    server = MockServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+# ==========================================
+# FAULT DEMO
+# ==========================================
+def fault_demo(rows=100_000, page_size=250, port=PORT):
+    """
+    Fetches generated rows from a server that serves 8 requests at a time
+    (4 more may queue, then 429), drops 1% of requests with a 503 and is down
+    entirely for 3 seconds mid-run. Prints the load the server saw over time,
+    then checks that every row arrived exactly once. Returns True if so.
+    """
+    import data_gov_fetcher
+
+    faults = Faults(capacity=8, queue=4, latency=0.1, error_rate=0.01, outage=(4.0, 3.0))
+    table = generated_rows(rows)
+    server, state = start_server(table, port, faults)
+    data_gov_fetcher.BASE_URL = f"http://127.0.0.1:{port}/resource"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            output_file = os.path.join(tmp, "demo.csv")
+            started = time.monotonic()
+            data_gov_fetcher.fetch_resource("demo", output_file, "demo-key", page_size=page_size,
+                                            concurrency=2, max_concurrency=32)
+            elapsed = time.monotonic() - started
+            fetched = pd.read_csv(output_file, dtype=str, keep_default_na=False)
+    finally:
+        server.shutdown()
+
+    print(f"\nServer saw {state.requests:,} requests in {elapsed:.1f}s: "
+          + ", ".join(f"{n:,} x {status}" for status, n in sorted(state.statuses.items())))
+    print(f"Requests already in the server at each arrival (capacity {faults.capacity}, "
+          f"429 above {faults.capacity + faults.queue}), per second:")
+    for second in range(int(elapsed) + 1):
+        load = [active for t, active in state.arrivals if second <= t < second + 1] or [0]
+        note = "  <- outage" if faults.outage[0] - 1 < second < sum(faults.outage) else ""
+        print(f"  {second:3d}s  requests {len(load):4d}  mean {sum(load) / len(load):5.1f}  max {max(load):3d}  "
+              f"{'#' * round(sum(load) / len(load))}{note}")
+
+    key = list(table.columns)
+    same = (len(fetched) == len(table)
+            and fetched.sort_values(key).reset_index(drop=True).equals(table.sort_values(key).reset_index(drop=True)))
+    print(f"{len(fetched):,} of {len(table):,} rows fetched, "
+          f"{'each exactly once' if same else 'MISMATCH against the served table'}")
+    return same
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a CSV page by page like api.data.gov.in.")
+    parser.add_argument("--csv", help="CSV to serve (default: generated rows)")
+    parser.add_argument("--rows", type=int, default=25_000, help="Rows to generate when no --csv is given")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Port (default: {PORT})")
+    parser.add_argument("--capacity", type=int, help="Requests served at once (default: unlimited)")
+    parser.add_argument("--queue", type=int, default=0, help="Requests that may wait beyond --capacity before a 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to serve one page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failed with a 503")
+    parser.add_argument("--outage", nargs=2, type=float, metavar=("START", "SECONDS"),
+                        help="Answer every request with a 503 for SECONDS, starting START seconds in")
+    parser.add_argument("--fault-demo", action="store_true",
+                        help="Run the fetcher against a faulty server and check the result, then exit")
+    args = parser.parse_args()
+
+    if args.fault_demo:
+        sys.exit(0 if fault_demo(port=args.port) else 1)
+
+    table = pd.read_csv(args.csv, dtype=str, keep_default_na=False) if args.csv else generated_rows(args.rows)
+    faults = Faults(args.capacity, args.queue, args.latency, args.error_rate, args.outage)
+    server, state = start_server(table, args.port, faults)
+    print(f"Serving {len(table):,} rows at http://127.0.0.1:{args.port}/resource/<any id> (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"{state.requests:,} requests over {state.connections:,} connections: "
+              + ", ".join(f"{n:,} x {status}" for status, n in sorted(state.statuses.items())))
@@ -0,0 +1,100 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ALIAS TABLES
+# ==========================================
+# Keys are lower-case, single-spaced spellings seen in the raw downloads;
+# values are the names used everywhere downstream (title case, as before).
+STATE_ALIASES = {
+    # Typos
+    "west bengli": "West Bengal",
+    "west bangal": "West Bengal",
+    "westbengal": "West Bengal",
+    "telengana": "Telangana",
+    "chattisgarh": "Chhattisgarh",
+    "tamilnadu": "Tamil Nadu",
+    # Old names
+    "orissa": "Odisha",
+    "pondicherry": "Puducherry",
+    "uttaranchal": "Uttarakhand",
+    "mysore": "Karnataka",
+    "laccadive": "Lakshadweep",
+    # '&' vs 'and' spellings and merged union territories
+    "jammu & kashmir": "Jammu And Kashmir",
+    "andaman & nicobar islands": "Andaman And Nicobar Islands",
+    "dadra & nagar haveli": "Dadra And Nagar Haveli And Daman And Diu",
+    "dadra and nagar haveli": "Dadra And Nagar Haveli And Daman And Diu",
+    "daman & diu": "Dadra And Nagar Haveli And Daman And Diu",
+    "daman and diu": "Dadra And Nagar Haveli And Daman And Diu",
+    "new delhi": "Delhi",
+    # Cities typed into the state field
+    "gurgaon": "Haryana",
+    "pune city": "Maharashtra",
+    "nagpur": "Maharashtra",
+    "jaipur": "Rajasthan",
+    "madanapalle": "Andhra Pradesh",
+    "balanagar": "Telangana",
+    "greater kailash 2": "Delhi",
+    "puttenahalli": "Karnataka",
+    "darbhanga": "Bihar",
+    "raja annamalai puram": "Tamil Nadu",
+}
+
+# Officially renamed districts
+DISTRICT_ALIASES = {
+    "gurgaon": "Gurugram",
+    "allahabad": "Prayagraj",
+    "faizabad": "Ayodhya",
+    "mewat": "Nuh",
+    "hoshangabad": "Narmadapuram",
+}
+
+
+def canonical_name(value, aliases):
+    """'  WEST   bengli ' -> 'West Bengal'. Missing values stay missing."""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return np.nan
+    text = re.sub(r'\s+', ' ', str(value)).strip()
+    return aliases.get(text.lower(), text.title())
+
+
+# ==========================================
+# NORMALISE ON THE DICTIONARY, NOT THE ROWS
+# ==========================================
+def normalize_names(values, aliases):
+    """
+    Canonicalises a column of names and returns it as a pandas Categorical.
+
+    The column is factorised once (hashing in C), each *distinct* spelling is
+    canonicalised in Python (a few hundred states / ~1,000 districts), and the
+    row codes are remapped through that small table. The cost of the Python
+    work depends on the number of unique names, not the number of rows.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    canonical = [canonical_name(u, aliases) for u in uniques]
+
+    # Several spellings can collapse onto one name ('Orissa', 'ODISHA' -> 'Odisha')
+    remap, categories = pd.factorize(pd.Series(canonical, dtype=object))
+    remap = np.append(remap, -1)  # code -1 (missing) stays -1
+    return pd.Categorical.from_codes(remap[codes], categories=categories)
+
+
+def normalize_states(values):
+    return normalize_names(values, STATE_ALIASES)
+
+
+def normalize_districts(values):
+    return normalize_names(values, DISTRICT_ALIASES)
+
+
+def count_matching(series, pattern):
+    """
+    Rows whose value contains `pattern` (case-insensitive), found by scanning
+    the distinct values instead of every row.
+    """
+    counts = series.value_counts(dropna=True)
+    hits = counts.index.astype(str).str.contains(pattern, case=False, regex=False)
+    return int(counts[hits].sum())
@@ -0,0 +1,285 @@
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from dataset_loader import ADULT_BIOMETRIC_COL, CHILD_ENROLMENT_COL, DATASETS, load_dataset
+from hybrid_ranking import BUFFER_SD, FLOOR_QUANTILE, MIN_KIDS
+from weekly_aggregates import load_weekly
+from weekly_matrix import row_median, row_quantile, row_std
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Streaming detection: enrolment and biometric rows are fed in as they are
+# ingested, summed into their district-week, and each week is scored the moment
+# it closes (both datasets have delivered a later day). Per district only the
+# last WINDOW closed weeks are kept, so memory does not grow with history.
+#
+#   Safe_Limit  the batch formula (median ratio, 0.5 SD buffer, 10% floor) over the window
+#   robust z    this week's kids-per-adult ratio against the window's median and MAD,
+#               the streaming stand-in for the Isolation Forest's confirmation
+#
+# A week ALERTs when New_Kids is above its Safe_Limit AND its robust z is at
+# least Z_THRESHOLD, after MIN_HISTORY closed weeks of the district.
+WINDOW = 26
+MIN_HISTORY = 8
+Z_THRESHOLD = 3.5
+KEYS = ['state', 'district']
+COUNT_COLUMNS = {'enrolment': CHILD_ENROLMENT_COL, 'biometric': ADULT_BIOMETRIC_COL}
+STATE_FILE = "Online_Detector_State.joblib"
+
+
+def week_end(dates):
+    """The Monday closing each date's week (the W-MON buckets of weekly_aggregates.py)."""
+    return (dates + pd.to_timedelta((7 - dates.dt.weekday) % 7, unit='D')).dt.normalize()
+
+
+def _concat(frames):
+    """One frame of scored district-weeks (empty, with the columns, if there are none)."""
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=KEYS + ['date', 'New_Kids', 'Adult_Updates', 'Safe_Limit', 'Robust_Z', 'ALERT'])
+    return pd.concat(frames, ignore_index=True)
+
+
+# ==========================================
+# 1. THE DETECTOR
+# ==========================================
+class OnlineDetector:
+    def __init__(self, window=WINDOW, min_history=MIN_HISTORY, z_threshold=Z_THRESHOLD):
+        self.window = window
+        self.min_history = min_history
+        self.z_threshold = z_threshold
+        # Closed weeks: one ring buffer row per district (slot order does not matter to the statistics)
+        self.index = {}
+        self.kids = np.zeros((0, window))
+        self.adults = np.zeros((0, window))
+        self.valid = np.zeros((0, window), dtype=bool)
+        self.next_slot = np.zeros(0, dtype=np.int64)
+        self.total_kids = np.zeros(0)
+        # Open weeks: week end -> {(state, district): [kids, adults, has kids, has adults]}
+        self.open = {}
+        self.watermarks = dict.fromkeys(COUNT_COLUMNS)
+        self.closed_through = None
+        self.late_rows = 0
+
+    def feed(self, kind, rows):
+        """
+        Adds rows of one dataset ('enrolment' or 'biometric': [date, state,
+        district, <its count column>]). Rows for weeks already closed are
+        counted in late_rows and dropped. Returns the weeks this closes (see close_week).
+        """
+        column = COUNT_COLUMNS[kind]
+        slot = 0 if kind == 'enrolment' else 1
+        rows = rows.dropna(subset=['date'] + KEYS)
+        if rows.empty:
+            return self._close_ready()
+        weeks = week_end(rows['date'])
+        if self.closed_through is not None:
+            late = (weeks <= self.closed_through).to_numpy()
+            self.late_rows += int(late.sum())
+            rows, weeks = rows[~late], weeks[~late]
+
+        sums = rows.groupby([weeks] + [rows[k] for k in KEYS], observed=True)[column].sum()
+        for (week, *key), value in sums.items():
+            cell = self.open.setdefault(week, {}).setdefault(tuple(key), [0, 0, False, False])
+            cell[slot] += value
+            cell[2 + slot] = True
+        latest = rows['date'].max() if len(rows) else None
+        if latest is not None and (self.watermarks[kind] is None or latest > self.watermarks[kind]):
+            self.watermarks[kind] = latest
+        return self._close_ready()
+
+    def advance(self, through):
+        """Declares both datasets complete up to `through`. Returns the weeks this closes."""
+        through = pd.Timestamp(through)
+        for kind, mark in self.watermarks.items():
+            if mark is None or through > mark:
+                self.watermarks[kind] = through
+        return self._close_ready()
+
+    def flush(self):
+        """Closes every open week (end of the stream)."""
+        return _concat([self.close_week(week) for week in sorted(self.open)])
+
+    def _close_ready(self):
+        # A week is complete once both datasets have delivered a day after it
+        if any(mark is None for mark in self.watermarks.values()):
+            return _concat([])
+        through = min(self.watermarks.values())
+        return _concat([self.close_week(week) for week in sorted(self.open) if week < through])
+
+    def _rows(self, keys):
+        """Ring buffer rows of these districts, adding new ones (capacity doubles as needed)."""
+        new = [k for k in dict.fromkeys(keys) if k not in self.index]
+        for key in new:
+            self.index[key] = len(self.index)
+        if len(self.index) > len(self.kids):
+            grow = max(len(self.index), 2 * len(self.kids)) - len(self.kids)
+            self.kids = np.vstack([self.kids, np.zeros((grow, self.window))])
+            self.adults = np.vstack([self.adults, np.zeros((grow, self.window))])
+            self.valid = np.vstack([self.valid, np.zeros((grow, self.window), dtype=bool)])
+            self.next_slot = np.concatenate([self.next_slot, np.zeros(grow, dtype=np.int64)])
+            self.total_kids = np.concatenate([self.total_kids, np.zeros(grow)])
+        return np.array([self.index[k] for k in keys], dtype=np.int64)
+
+    # ==========================================
+    # 2. SCORING A CLOSED WEEK
+    # ==========================================
+    def close_week(self, week):
+        """
+        Scores every district with both datasets in `week` against its window
+        of earlier weeks, then adds the week to the window. Returns
+        [state, district, date, New_Kids, Adult_Updates, Safe_Limit, Robust_Z, ALERT].
+        """
+        cells = self.open.pop(week, {})
+        self.closed_through = week if self.closed_through is None else max(self.closed_through, week)
+        # Like the batch aggregates: only district-weeks present in both datasets
+        present = [(key, cell) for key, cell in cells.items() if cell[2] and cell[3]]
+        if not present:
+            return _concat([])
+        keys = [key for key, _ in present]
+        kids = np.array([cell[0] for _, cell in present], dtype=float)
+        adults = np.array([cell[1] for _, cell in present], dtype=float)
+        rows = self._rows(keys)
+
+        history_kids, history_adults, history = self.kids[rows], self.adults[rows], self.valid[rows]
+        history_ratio = history_kids / np.where(history_adults == 0, 1, history_adults)
+        ratio = row_median(history_ratio, history)
+        buffer = row_std(history_kids, history) * BUFFER_SD
+        floor = row_quantile(history_kids, history, FLOOR_QUANTILE)
+        with np.errstate(invalid='ignore'):
+            limits = np.maximum(adults * ratio + buffer, floor)
+            mad = 1.4826 * row_median(np.abs(history_ratio - ratio[:, None]), history)
+            excess = kids / np.where(adults == 0, 1, adults) - ratio
+            z = np.where(mad > 0, excess / np.where(mad > 0, mad, 1), np.where(excess > 0, np.inf, 0.0))
+            self.total_kids[rows] += kids
+            alert = ((history.sum(axis=1) >= self.min_history) & (self.total_kids[rows] >= MIN_KIDS)
+                     & (kids > limits) & (z >= self.z_threshold))
+
+        # Into the window: overwrite each district's oldest slot
+        slots = self.next_slot[rows] % self.window
+        self.kids[rows, slots] = kids
+        self.adults[rows, slots] = adults
+        self.valid[rows, slots] = True
+        self.next_slot[rows] += 1
+
+        scored = pd.DataFrame(keys, columns=KEYS)
+        scored['date'] = week
+        scored['New_Kids'] = kids
+        scored['Adult_Updates'] = adults
+        scored['Safe_Limit'] = limits
+        scored['Robust_Z'] = z
+        scored['ALERT'] = alert
+        return scored
+
+    # ==========================================
+    # 3. PERSISTENCE (carry the state between runs)
+    # ==========================================
+    def save(self, path=STATE_FILE):
+        joblib.dump(self, path + ".part")
+        os.replace(path + ".part", path)
+
+    @staticmethod
+    def load(path=STATE_FILE):
+        return joblib.load(path) if os.path.exists(path) else OnlineDetector()
+
+    def state_bytes(self):
+        """Memory held per district (windows) plus the open weeks, roughly."""
+        arrays = self.kids.nbytes + self.adults.nbytes + self.valid.nbytes + self.next_slot.nbytes + self.total_kids.nbytes
+        return arrays + sum(len(cells) for cells in self.open.values()) * 100
+
+
+def print_alerts(scored):
+    for _, row in scored[scored['ALERT']].iterrows():
+        print(f"  ALERT week {row['date'].date()}: {row['state']} / {row['district']}  "
+              f"{row['New_Kids']:,.0f} kids vs Safe_Limit {row['Safe_Limit']:,.0f} (robust z {row['Robust_Z']:.1f})")
+
+
+# ==========================================
+# 4. REPLAY (the historical data as a stream)
+# ==========================================
+def replay(file_enrol=DATASETS['enrolment']['file'], file_update=DATASETS['biometric']['file'], quiet=False):
+    """
+    Feeds the cleaned datasets day by day, in date order, as if they were
+    arriving live, printing alerts as weeks close. Then checks that the weekly
+    totals the stream scored are exactly the batch aggregates. Returns True if so.
+    """
+    streams = {}
+    for kind, path in (('enrolment', file_enrol), ('biometric', file_update)):
+        df = load_dataset(kind, columns=['date'] + KEYS + [COUNT_COLUMNS[kind]], path=path)
+        df = df.dropna(subset=['date']).sort_values('date', kind='stable')
+        streams[kind] = dict(iter(df.groupby('date', observed=True)))
+    days = sorted(set(streams['enrolment']) | set(streams['biometric']))
+
+    detector = OnlineDetector()
+    scored, rows, started = [], 0, time.monotonic()
+    for day in days:
+        for kind, by_day in streams.items():
+            if day in by_day:
+                rows += len(by_day[day])
+                closed = detector.feed(kind, by_day[day])
+                if not closed.empty:
+                    scored.append(closed)
+                    if not quiet:
+                        print_alerts(closed)
+    closed = detector.flush()
+    scored.append(closed)
+    if not quiet:
+        print_alerts(closed)
+    elapsed = time.monotonic() - started
+    scored = pd.concat(scored, ignore_index=True)
+
+    print(f"\nReplayed {rows:,} rows over {len(days)} days in {elapsed:.1f}s: "
+          f"{len(scored):,} district-weeks scored, {int(scored['ALERT'].sum())} alerts, "
+          f"{len(detector.index)} districts x {detector.window}-week window "
+          f"({detector.state_bytes() / 1e6:.1f} MB of state), {detector.late_rows} late rows")
+
+    # The stream must see exactly the weeks (and totals) the batch detectors see
+    batch = load_weekly('district', file_enrol, file_update)
+    batch = batch.assign(**{k: batch[k].astype(str) for k in KEYS})
+    ours = scored.assign(**{k: scored[k].astype(str) for k in KEYS})
+    both = batch.merge(ours, on=KEYS + ['date'], how='outer', suffixes=('_batch', '_stream'), indicator=True)
+    same = ((both['_merge'] == 'both').all()
+            and (both['New_Kids_batch'] == both['New_Kids_stream']).all()
+            and (both['Adult_Updates_batch'] == both['Adult_Updates_stream']).all())
+    print(f"Streamed weekly totals {'match' if same else 'DO NOT match'} the batch aggregates "
+          f"({len(batch):,} district-weeks)")
+    return same
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score district-weeks as the data arrives.")
+    parser.add_argument("--replay", action="store_true",
+                        help="Stream the cleaned datasets day by day and check against the batch aggregates, then exit")
+    parser.add_argument("--quiet", action="store_true", help="With --replay, only print the summary")
+    parser.add_argument("--enrolment", help="New enrolment rows to feed (cleaned format)")
+    parser.add_argument("--biometric", help="New biometric rows to feed (cleaned format)")
+    parser.add_argument("--through", help="Both datasets are complete up to this date: close the weeks before it")
+    parser.add_argument("--state", default=STATE_FILE, help=f"Detector state carried between runs (default: {STATE_FILE})")
+    args = parser.parse_args()
+
+    if args.replay:
+        sys.exit(0 if replay(quiet=args.quiet) else 1)
+
+    detector = OnlineDetector.load(args.state)
+    closed = []
+    for kind, path in (('enrolment', args.enrolment), ('biometric', args.biometric)):
+        if path:
+            closed.append(detector.feed(kind, load_dataset(kind, columns=['date'] + KEYS + [COUNT_COLUMNS[kind]],
+                                                           path=path)))
+    if args.through:
+        closed.append(detector.advance(args.through))
+    closed = _concat(closed)
+    print_alerts(closed)
+    detector.save(args.state)
+    print(f"{len(closed):,} district-weeks closed, {int(closed['ALERT'].sum()) if len(closed) else 0} alerts; "
+          f"{len(detector.open)} week(s) still open. State saved to {args.state}")
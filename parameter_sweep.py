@@ -0,0 +1,192 @@
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from hybrid_ranking import BUFFER_SD, FLOOR_QUANTILE, MIN_KIDS
+from weekly_aggregates import LEVELS, load_weekly_matrix
+from weekly_matrix import row_median, row_quantile, row_std
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Tries many detector settings in one run. The weekly aggregates, the
+# per-entity statistics and the AI model are computed once; each combination
+# of the grid below is then a few whole-matrix operations.
+FILE_ENROL = "Cleaned_Final_Monthly_Data_Combined.csv"
+FILE_UPDATE = "Cleaned_Final_Biometric_Data_Combined.csv"
+
+# The grid (each list holds the value the detectors use today)
+GRID = {
+    'buffer_sd': [0.25, BUFFER_SD, 1.0, 1.5],
+    'floor_quantile': [0.05, FLOOR_QUANTILE, 0.25],
+    'margin': [1.0, 1.1, 1.25],              # kids must exceed Safe_Limit x margin
+    'contamination': [0.02, 0.05, 0.1],      # share of weeks the AI flags
+    'min_kids': [25, MIN_KIDS, 100],         # noise filter on total New_Kids
+}
+# fwdusingai.py's settings: rank stability is measured against this combination
+BASELINE = {'buffer_sd': BUFFER_SD, 'floor_quantile': FLOOR_QUANTILE, 'margin': 1.0,
+            'contamination': 0.05, 'min_kids': MIN_KIDS}
+TOP_N = 20
+
+SUMMARY_FILE = "Parameter_Sweep_Summary.csv"
+HIT_LISTS_FILE = "Parameter_Sweep_Hit_Lists.csv"
+
+
+# ==========================================
+# 1. EVERYTHING THAT DOES NOT DEPEND ON THE GRID
+# ==========================================
+def ai_scores(weekly, random_state=42):
+    """
+    IsolationForest scores of every entity-week (entity x week matrix, lower =
+    more anomalous), from the same features and model as fwdusingai.py.
+    The trees do not depend on `contamination`: it only sets the score below
+    which a week is flagged, so one fit serves every contamination.
+    """
+    df = weekly.to_weekly()
+    ratio = df['New_Kids'] / df['Adult_Updates'].replace(0, 1)
+    X_scaled = StandardScaler().fit_transform(pd.DataFrame({'New_Kids': df['New_Kids'], 'Dependency_Ratio': ratio}))
+    model = IsolationForest(random_state=random_state).fit(X_scaled)
+    return weekly.to_matrix(model.score_samples(X_scaled))
+
+
+def ai_flags(scores, valid, contamination):
+    """Weeks the model flags at this contamination (exactly what fit_predict returns)."""
+    threshold = np.percentile(scores[valid], 100.0 * contamination)
+    return valid & (scores < threshold)
+
+
+# ==========================================
+# 2. THE BATCHED PASS
+# ==========================================
+def sweep(weekly, grid=GRID, scores=None, top_n=TOP_N):
+    """
+    Evaluates every combination of `grid`. Returns (summary, hit_lists, severity):
+    one summary row per combination, the top_n hit-list of each, and the
+    combinations x entities severity matrix (for rank comparisons).
+    `scores=None` runs the rule alone (every week counts as AI-flagged).
+    """
+    kids = np.asarray(weekly.kids, dtype=float)
+    adults = np.asarray(weekly.adults)
+    valid = np.asarray(weekly.valid)
+
+    # Per-entity statistics: once
+    ratio = row_median(kids / np.where(adults == 0, 1, adults), valid)
+    expected = adults * ratio[:, None]
+    std = row_std(kids, valid)
+    floors = row_quantile(kids, valid, grid['floor_quantile'])   # one sort for every quantile
+    totals = kids.sum(axis=1)
+
+    contaminations = grid['contamination'] if scores is not None else [None]
+    flags = np.stack([ai_flags(scores, valid, c) if c is not None else valid for c in contaminations])
+    margins = np.asarray(grid['margin'], dtype=float)[:, None, None, None]
+    active = np.stack([totals >= k for k in grid['min_kids']])   # (min_kids, entities)
+
+    combos, severities, counts, weeks_flagged = [], [], [], []
+    for buffer_sd, (q, floor) in itertools.product(grid['buffer_sd'], zip(grid['floor_quantile'], floors)):
+        limits = np.maximum(expected + (std * buffer_sd)[:, None], floor[:, None])
+        # (margin, contamination, entity, week) in one go
+        with np.errstate(invalid='ignore'):
+            hits = (kids > limits * margins) & flags[None]
+        extra = np.where(hits, kids - limits, 0).sum(axis=3)          # (margin, contamination, entity)
+        count = hits.sum(axis=3)
+        for (mi, margin), (ci, c), (ki, min_kids) in itertools.product(
+                enumerate(grid['margin']), enumerate(contaminations), enumerate(grid['min_kids'])):
+            keep = active[ki]
+            combos.append({'buffer_sd': buffer_sd, 'floor_quantile': q, 'margin': margin,
+                           'contamination': c, 'min_kids': min_kids})
+            severities.append(np.where(keep, extra[mi, ci], 0))
+            counts.append(np.where(keep, count[mi, ci], 0))
+            weeks_flagged.append(int(counts[-1].sum()))
+    severity = np.array(severities)
+    count = np.array(counts)
+
+    summary = pd.DataFrame(combos)
+    summary['flagged_weeks'] = weeks_flagged
+    summary['ranked_entities'] = (count > 0).sum(axis=1)
+
+    # Hit-lists: entities with a flagged week, by severity (ties by entity order, like a stable sort)
+    order = np.argsort(-severity, axis=1, kind='stable')[:, :top_n]
+    lists = []
+    for i in range(len(combos)):
+        top = order[i][count[i, order[i]] > 0]
+        hit_list = weekly.entities.iloc[top].reset_index(drop=True)
+        hit_list.insert(0, 'rank', np.arange(1, len(top) + 1))
+        hit_list.insert(0, 'combination', i)
+        hit_list['fraud_severity'] = severity[i, top]
+        hit_list['anomaly_count'] = count[i, top]
+        lists.append(hit_list)
+    hit_lists = pd.concat(lists, ignore_index=True)
+    return summary, hit_lists, severity
+
+
+def rank_stability(summary, severity, baseline=BASELINE, top_n=TOP_N):
+    """
+    Adds, per combination, how far its ranking is from the baseline's:
+    top_overlap (share of the baseline's top_n still in the top_n) and
+    rank_corr (Spearman correlation of severities over all entities).
+    """
+    match = np.ones(len(summary), dtype=bool)
+    for name, value in baseline.items():
+        match &= np.isclose(summary[name].astype(float), value) if value is not None else summary[name].isna()
+    if not match.any():
+        raise ValueError(f"the grid does not contain the baseline combination {baseline}")
+    base = int(np.flatnonzero(match)[0])
+
+    def top(i):
+        ranked = np.flatnonzero(severity[i] > 0)
+        return set(ranked[np.argsort(-severity[i, ranked], kind='stable')][:top_n])
+
+    base_top = top(base)
+    summary['top_overlap'] = [len(top(i) & base_top) / max(len(base_top), 1) for i in range(len(summary))]
+    # Spearman = Pearson on the ranks (average ranks for ties, as pandas)
+    ranks = pd.DataFrame(severity.T).rank().to_numpy().T
+    with np.errstate(invalid='ignore'):
+        summary['rank_corr'] = [np.corrcoef(ranks[i], ranks[base])[0, 1] for i in range(len(summary))]
+    summary['baseline'] = np.arange(len(summary)) == base
+    return summary
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a grid of detector settings in one pass.")
+    parser.add_argument("--level", choices=list(LEVELS), default='district', help="Entities to rank (default: district)")
+    parser.add_argument("--no-ai", action="store_true",
+                        help="Rule only, every week counts as AI-flagged (as find_worst_districts.py)")
+    for name, values in GRID.items():
+        parser.add_argument("--" + name.replace('_', '-'), nargs='+', type=float, default=values,
+                            help=f"Values to try (default: {' '.join(map(str, values))})")
+    parser.add_argument("--top", type=int, default=TOP_N, help=f"Hit-list length (default: {TOP_N})")
+    args = parser.parse_args()
+
+    grid = {name: getattr(args, name) for name in GRID}
+    grid['min_kids'] = [int(k) for k in grid['min_kids']]
+    baseline = dict(BASELINE, contamination=None if args.no_ai else BASELINE['contamination'])
+
+    print("Loading Data...")
+    weekly = load_weekly_matrix(args.level, FILE_ENROL, FILE_UPDATE)
+
+    scores = None
+    if not args.no_ai:
+        print("Training AI Model once...")
+        scores = ai_scores(weekly)
+
+    n = np.prod([len(v) for k, v in grid.items() if k != 'contamination' or not args.no_ai])
+    print(f"Evaluating {n} combinations over {weekly.kids.shape[0]:,} {args.level}s x {weekly.kids.shape[1]} weeks...")
+    summary, hit_lists, severity = sweep(weekly, grid, scores, args.top)
+    summary = rank_stability(summary, severity, baseline, args.top)
+
+    summary.to_csv(SUMMARY_FILE, index_label='combination')
+    hit_lists.to_csv(HIT_LISTS_FILE, index=False)
+
+    print("\n" + "="*50)
+    print(" PARAMETER SWEEP (rank stability vs. the current settings)")
+    print("="*50)
+    print(summary.to_string(float_format=lambda x: f"{x:.3g}"))
+    print("="*50)
+    print(f"Saved {SUMMARY_FILE} and the hit-list of every combination to {HIT_LISTS_FILE}")
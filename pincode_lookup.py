@@ -0,0 +1,242 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import requests
+
+from merge_engine import file_sha256
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Indian pincodes are 6-digit integers (first digit 1-9), so a plain array with
+# one slot per possible pincode replaces the string-keyed join with the master.
+PINCODE_SLOTS = 1_000_000
+MIN_PINCODE = 100_000
+
+UNKNOWN = -1
+
+# The processed master (see pincode.py) and where its compiled arrays are cached.
+# The cache is keyed by the SHA-256 of the master file, so editing or replacing
+# the CSV rebuilds it automatically.
+PINCODE_MASTER_FILE = "pincode_master_unique.csv"
+CACHE_DIR = ".pincode_cache"
+FALLBACK_URL = "https://raw.githubusercontent.com/sanand0/pincode/master/data/IN.csv"
+
+# Column names used by the different sources, mapped onto the master's
+MASTER_COLUMNS = ['Pincode', 'State', 'District', 'Latitude', 'Longitude']
+SOURCE_ALIASES = {
+    'key': 'Pincode', 'pincode': 'Pincode',
+    'admin_name1': 'State', 'statename': 'State', 'state': 'State',
+    'admin_name2': 'District', 'district': 'District',
+    'latitude': 'Latitude', 'longitude': 'Longitude',
+}
+
+
+def pincode_array(values):
+    """
+    Converts a column of pincodes (ints, floats like 500001.0, strings, <NA>)
+    into an int64 array; anything that is not a valid 6-digit pincode becomes -1.
+    """
+    pins = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    valid = np.isfinite(pins) & (pins >= MIN_PINCODE) & (pins < PINCODE_SLOTS) & (pins == np.round(pins))
+    return np.where(valid, pins, UNKNOWN).astype(np.int64)
+
+
+class PincodeLookup:
+    """
+    The pincode master compiled into dense lookup arrays:
+    state_codes[pincode] / district_codes[pincode] index into state_names /
+    district_names (-1 = pincode not in the master), latitude[pincode] /
+    longitude[pincode] hold the coordinates (NaN = unknown). Two int16 and two
+    float32 arrays of one million slots: about 12 MB.
+    """
+
+    def __init__(self, state_names, district_names, state_codes, district_codes,
+                 latitude=None, longitude=None, directory=None):
+        self.state_names = np.asarray(state_names, dtype=object)
+        self.district_names = np.asarray(district_names, dtype=object)
+        self.state_codes = state_codes
+        self.district_codes = district_codes
+        self.latitude = latitude if latitude is not None else np.full(PINCODE_SLOTS, np.nan, dtype=np.float32)
+        self.longitude = longitude if longitude is not None else np.full(PINCODE_SLOTS, np.nan, dtype=np.float32)
+        # Where the arrays live on disk (set by load()), so worker processes can map the same files
+        self.directory = directory
+
+    @classmethod
+    def from_master(cls, master_df):
+        """Builds the arrays from the master's [Pincode, State, District] (+ optional Latitude, Longitude)."""
+        pins = pincode_array(master_df['Pincode'])
+        table = pd.DataFrame({
+            'pin': pins,
+            'state': master_df['State'].to_numpy(),
+            'district': master_df['District'].to_numpy(),
+        })
+        for col in ('Latitude', 'Longitude'):
+            table[col] = pd.to_numeric(master_df[col], errors='coerce').to_numpy() if col in master_df else np.nan
+        # Same rule as the old join: the first master row for a pincode wins
+        table = table[table['pin'] != UNKNOWN].drop_duplicates(subset=['pin'], keep='first')
+        slots = table['pin'].to_numpy()
+
+        state_codes = np.full(PINCODE_SLOTS, UNKNOWN, dtype=np.int16)
+        district_codes = np.full(PINCODE_SLOTS, UNKNOWN, dtype=np.int16)
+        latitude = np.full(PINCODE_SLOTS, np.nan, dtype=np.float32)
+        longitude = np.full(PINCODE_SLOTS, np.nan, dtype=np.float32)
+
+        # factorize() gives -1 for missing names, which is exactly "unknown"
+        s_codes, state_names = pd.factorize(table['state'])
+        d_codes, district_names = pd.factorize(table['district'])
+        state_codes[slots] = s_codes
+        district_codes[slots] = d_codes
+        latitude[slots] = table['Latitude'].to_numpy(dtype='float64')
+        longitude[slots] = table['Longitude'].to_numpy(dtype='float64')
+
+        return cls(state_names, district_names, state_codes, district_codes, latitude, longitude)
+
+    def save(self, directory):
+        """Writes the arrays as .npy files (plus the name tables as JSON) into `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "state_codes.npy"), self.state_codes)
+        np.save(os.path.join(directory, "district_codes.npy"), self.district_codes)
+        np.save(os.path.join(directory, "latitude.npy"), self.latitude)
+        np.save(os.path.join(directory, "longitude.npy"), self.longitude)
+        with open(os.path.join(directory, "names.json"), 'w', encoding='utf-8') as f:
+            json.dump({'states': list(self.state_names), 'districts': list(self.district_names)}, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Opens a lookup written by save(). With mmap=True the arrays are
+        memory-mapped read-only: every process that loads the same directory
+        shares one copy through the OS page cache instead of receiving its own.
+        """
+        mode = 'r' if mmap else None
+        with open(os.path.join(directory, "names.json"), encoding='utf-8') as f:
+            names = json.load(f)
+        return cls(
+            names['states'],
+            names['districts'],
+            np.load(os.path.join(directory, "state_codes.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, "district_codes.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, "latitude.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, "longitude.npy"), mmap_mode=mode),
+            directory=directory,
+        )
+
+    def codes(self, pincodes):
+        """Vectorised lookup: returns (state_codes, district_codes) for each row, -1 where unknown."""
+        pins = pincode_array(pincodes)
+        known = pins != UNKNOWN
+        slots = np.where(known, pins, 0)
+        state = np.where(known, self.state_codes[slots], UNKNOWN)
+        district = np.where(known, self.district_codes[slots], UNKNOWN)
+        return state, district
+
+    def coordinates(self, pincodes):
+        """Vectorised (latitude, longitude) for each row, NaN where the pincode is unknown."""
+        pins = pincode_array(pincodes)
+        known = pins != UNKNOWN
+        slots = np.where(known, pins, 0)
+        return (
+            np.where(known, self.latitude[slots], np.nan).astype('float64'),
+            np.where(known, self.longitude[slots], np.nan).astype('float64'),
+        )
+
+    def official_names(self, pincodes, fallback_state, fallback_district):
+        """
+        Official State/District name for every row; rows whose pincode is not in
+        the master keep their original (fallback) name.
+        """
+        state, district = self.codes(pincodes)
+        return (
+            _pick(self.state_names, state, fallback_state),
+            _pick(self.district_names, district, fallback_district),
+        )
+
+
+def _pick(names, codes, fallback):
+    fallback = np.asarray(fallback, dtype=object)
+    if len(names) == 0:
+        return fallback
+    return np.where(codes != UNKNOWN, names[np.maximum(codes, 0)], fallback)
+
+
+# ==========================================
+# THE CACHED MASTER
+# ==========================================
+def prepare_master(raw_df):
+    """
+    The pincode.py step: standard column names, numeric Latitude/Longitude, and
+    one row per pincode, preferring a row that has GPS coordinates.
+    Returns [Pincode, State, District, Latitude, Longitude].
+    """
+    df = raw_df.rename(columns={c: SOURCE_ALIASES[c.lower()] for c in raw_df.columns
+                                if c.lower() in SOURCE_ALIASES and c not in MASTER_COLUMNS})
+    df = df.loc[:, ~df.columns.duplicated()]
+    for col in ('Latitude', 'Longitude'):
+        df[col] = pd.to_numeric(df[col], errors='coerce') if col in df else np.nan
+
+    has_gps = df['Latitude'].notna() & df['Longitude'].notna()
+    df = df.iloc[np.argsort(~has_gps.to_numpy(), kind='stable')]
+    df = df.drop_duplicates(subset=['Pincode'], keep='first').sort_index()
+    return df[MASTER_COLUMNS].reset_index(drop=True)
+
+
+def _download_master(path):
+    print(f"Pincode Master not found locally. Downloading from {FALLBACK_URL}...")
+    content = requests.get(FALLBACK_URL, timeout=60).content
+    master = prepare_master(pd.read_csv(io.StringIO(content.decode('utf-8')), dtype=str))
+    master.to_csv(path, index=False)
+    print(f"  Saved {len(master):,} pincodes to {path}")
+
+
+def load_master_lookup(path=PINCODE_MASTER_FILE, cache_dir=CACHE_DIR):
+    """
+    The pincode master as a PincodeLookup, in milliseconds.
+
+    The CSV is parsed only when its SHA-256 has no compiled copy in `cache_dir`;
+    otherwise the arrays are memory-mapped straight from the cache. Caches of
+    older versions of the same file are removed. A missing master is downloaded
+    (and saved as `path`) first.
+    """
+    if not os.path.exists(path):
+        _download_master(path)
+
+    digest = file_sha256(path)[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    target = os.path.join(cache_dir, f"{stem}-{digest}")
+    if os.path.exists(os.path.join(target, "names.json")):
+        return PincodeLookup.load(target)
+
+    print(f"Compiling Pincode Master {path} (first use of this version)...")
+    master = prepare_master(pd.read_csv(path, dtype=str))
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=stem + "-", suffix=".part", dir=cache_dir)
+    PincodeLookup.from_master(master).save(temp_dir)
+
+    for old in os.listdir(cache_dir):
+        if old.startswith(stem + "-") and not old.endswith(".part") and old != os.path.basename(target):
+            shutil.rmtree(os.path.join(cache_dir, old), ignore_errors=True)
+    try:
+        os.replace(temp_dir, target)
+    except OSError:  # another process finished the same cache first
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    print(f"  {len(master):,} unique pincodes cached in {target}")
+    return PincodeLookup.load(target)
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the pincode master if missing and compile its cache.")
+    parser.add_argument("--master", default=PINCODE_MASTER_FILE, help=f"Master CSV (default: {PINCODE_MASTER_FILE})")
+    args = parser.parse_args()
+
+    lookup = load_master_lookup(args.master)
+    print(f"{int((lookup.state_codes != UNKNOWN).sum()):,} pincodes ready in {lookup.directory}")
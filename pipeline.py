@@ -0,0 +1,407 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import merge_biometric
+import merge_demographic
+import merge_enrollment
+from columnar_store import columnar_path, parquet_available
+from merge_engine import file_sha256, resolve_split_files
+from pincode_lookup import PINCODE_MASTER_FILE
+from weekly_aggregates import aggregate_path
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Fingerprints of every stage's last successful run, cached file hashes and
+# one log per stage live here.
+STATE_DIR = ".pipeline"
+
+# Stages run at the same time (one process each)
+JOBS = os.cpu_count() or 1
+
+# Worker processes the merge and clean stages may use in total
+WORKERS = os.cpu_count() or 1
+
+# Where the dedup stage writes (same file names as the merge outputs)
+DEDUP_DIR = "Deduplicated"
+
+# The merge_*.py scripts own the split locations and merged file names
+DATASETS = {
+    'enrolment': merge_enrollment,
+    'biometric': merge_biometric,
+    'demographic': merge_demographic,
+}
+
+# What the detection and chart scripts write (they are not imported here: matplotlib is slow to load)
+SCORED_WEEKS_FILE = "Scored_District_Weeks.parquet"   # fwdusingai.py
+HIT_LIST_FILE = "National_Fraud_Hit_List.csv"          # fwdusingai.py
+ARTIFACT_DIR = "AI_Model_Artifacts"                    # fwdusingai.py (anomaly_model.py), saved model versions
+DISTRICT_GRAPHS = "National_Top_20_Fraud_Districts"   # render_evidence.py
+STATE_GRAPHS = "Final_Fraud_Detection_Graphs"         # detect_ghost_childern.py
+PINCODE_HIT_LIST_FILE = "Pincode_Fraud_Hit_List.csv"   # detect_pincodes.py
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# ==========================================
+# 1. CONTENT FINGERPRINTS
+# ==========================================
+class HashCache:
+    """
+    SHA-256 of files, remembered by (size, mtime) so an unchanged multi-GB
+    input is only read once. Directories hash as the list of their files.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def file(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+        digest = file_sha256(path)
+        self.entries[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def path_digest(self, path):
+        """Hash of a file or a whole directory; None if it does not exist."""
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for folder, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(folder, name)
+                digest.update(os.path.relpath(full, path).replace(os.sep, '/').encode('utf-8'))
+                digest.update(self.file(full).encode('ascii'))
+        return digest.hexdigest()
+
+    def save(self):
+        _write_json(self.path, self.entries)
+
+
+def _write_json(path, data):
+    with open(path + ".part", 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(path + ".part", path)
+
+
+def local_sources(script):
+    """`script` plus every module of this repository it imports (recursively)."""
+    seen = []
+    todo = [os.path.abspath(script)]
+    while todo:
+        path = todo.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            names = []
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            for name in names:
+                module = os.path.join(ROOT, name.split('.')[0] + ".py")
+                if os.path.exists(module):
+                    todo.append(module)
+    return sorted(seen)
+
+
+# ==========================================
+# 2. THE STAGES
+# ==========================================
+class Stage:
+    """
+    One step of the pipeline: a command (one of the repository's scripts) with
+    declared inputs, outputs and parameters. `inputs` may be a callable, for
+    inputs only known once the upstream stages have run.
+    """
+
+    def __init__(self, name, script, args=(), deps=(), inputs=(), outputs=(), params=None, unused_code=()):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.deps = list(deps)
+        self.inputs = inputs
+        self.outputs = list(outputs)
+        self.params = params or {}
+        # Modules the script imports but does not run with these arguments (left out of the fingerprint)
+        self.unused_code = [os.path.join(ROOT, path) for path in unused_code]
+
+    @property
+    def command(self):
+        return [sys.executable, os.path.join(ROOT, self.script)] + self.args
+
+    def input_paths(self):
+        return list(self.inputs() if callable(self.inputs) else self.inputs)
+
+    def fingerprint(self, hashes):
+        """Hash of everything the outputs depend on: code, parameters and input contents."""
+        description = {
+            'params': self.params,
+            'code': {os.path.relpath(p, ROOT): hashes.file(p) for p in local_sources(self.command[1])
+                     if p not in self.unused_code},
+            'inputs': {p: hashes.path_digest(p) for p in self.input_paths()},
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _with_twin(path):
+    """A stage output and its Parquet twin (see columnar_store.py)."""
+    return [path, columnar_path(path)] if parquet_available() else [path]
+
+
+def build_stages(splits=None, workers=WORKERS):
+    """
+    The stage DAG:
+    merge -> dedup -> clean -> aggregate -> detect -> render
+    (merge and dedup once per dataset; clean also needs pincode_master, the
+    merges do not; the state charts only need the aggregates).
+    The raw UIDAI splits are not downloaded here: they are external inputs (the
+    folders in the merge_*.py scripts, or `splits`), fingerprinted by content.
+    """
+    splits = splits or {}
+    stages = [
+        Stage('pincode_master', 'pincode_lookup.py', ['--master', PINCODE_MASTER_FILE],
+              outputs=[PINCODE_MASTER_FILE]),
+    ]
+
+    merge_workers = max(1, workers // len(DATASETS))
+    cleaned = {}
+    for name, module in DATASETS.items():
+        source = splits.get(name, module.SPLIT_FILES)
+        merged = module.OUTPUT_FILE
+        deduped = os.path.join(DEDUP_DIR, os.path.basename(merged))
+        cleaned[name] = "Cleaned_" + os.path.basename(merged)
+
+        # Worker counts are left out of the parameters: the outputs do not depend on them
+        stages.append(Stage(f'merge_{name}', module.__name__ + ".py",
+                            ['--source', source, '--output', merged, '--workers', str(merge_workers)],
+                            inputs=lambda source=source: resolve_split_files(source),
+                            outputs=_with_twin(merged),
+                            params={'source': source}))
+        stages.append(Stage(f'dedup_{name}', 'dedup_rows.py', [merged, '--output', deduped],
+                            deps=[f'merge_{name}'],
+                            inputs=_with_twin(merged),
+                            outputs=_with_twin(deduped)))
+
+    deduped_files = [os.path.join(DEDUP_DIR, os.path.basename(m.OUTPUT_FILE)) for m in DATASETS.values()]
+    stages += [
+        Stage('clean', 'clean_all_datasets.py', deduped_files + ['--workers', str(workers)],
+              deps=['pincode_master'] + [f'dedup_{name}' for name in DATASETS],
+              inputs=[PINCODE_MASTER_FILE] + [p for f in deduped_files for p in _with_twin(f)],
+              outputs=[p for f in cleaned.values() for p in _with_twin(f)]),
+        Stage('aggregate', 'weekly_aggregates.py',
+              ['--enrolment', cleaned['enrolment'], '--biometric', cleaned['biometric']],
+              deps=['clean'],
+              inputs=_with_twin(cleaned['enrolment']) + _with_twin(cleaned['biometric']),
+              outputs=[aggregate_path('state'), aggregate_path('district'), aggregate_path('pincode')]),
+        Stage('detect', 'fwdusingai.py', ['--no-render'],
+              deps=['aggregate'],
+              inputs=[aggregate_path('district')],
+              outputs=[SCORED_WEEKS_FILE, HIT_LIST_FILE, ARTIFACT_DIR],
+              unused_code=['render_evidence.py']),
+        Stage('detect_pincodes', 'detect_pincodes.py',
+              deps=['aggregate'],
+              inputs=[aggregate_path('pincode')],
+              outputs=[PINCODE_HIT_LIST_FILE]),
+        Stage('render_districts', 'render_evidence.py',
+              deps=['detect'],
+              inputs=[SCORED_WEEKS_FILE, HIT_LIST_FILE],
+              outputs=[DISTRICT_GRAPHS]),
+        Stage('render_states', 'detect_ghost_childern.py',
+              deps=['aggregate'],
+              inputs=[aggregate_path('state')],
+              outputs=[STATE_GRAPHS]),
+    ]
+    return {stage.name: stage for stage in stages}
+
+
+def _matching(stages, names):
+    """Stage names matching `names`; 'merge' matches every merge_* stage."""
+    unknown = [n for n in names if not any(name == n or name.startswith(n + '_') for name in stages)]
+    if unknown:
+        raise KeyError(f"Unknown stage(s) {unknown}. Stages: {list(stages)}")
+    return [name for name in stages if any(name == n or name.startswith(n + '_') for n in names)]
+
+
+def select(stages, targets):
+    """The target stages plus everything they depend on, in DAG order."""
+    wanted = set()
+    todo = _matching(stages, targets)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(stages[name].deps)
+    return [name for name in stages if name in wanted]
+
+
+# ==========================================
+# 3. RUNNING
+# ==========================================
+def _run_stage(stage, log_file):
+    """Runs one stage's command with its output going to `log_file`. Returns (ok, seconds)."""
+    started = time.perf_counter()
+    for output in stage.outputs:
+        folder = os.path.dirname(output)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+    with open(log_file, 'w', encoding='utf-8') as log:
+        log.write(f"$ {subprocess.list2cmdline(stage.command)}\n")
+        log.flush()
+        env = dict(os.environ, MPLBACKEND=os.environ.get('MPLBACKEND', 'Agg'), PYTHONIOENCODING='utf-8')
+        result = subprocess.run(stage.command, stdout=log, stderr=subprocess.STDOUT, env=env)
+    return result.returncode == 0, time.perf_counter() - started
+
+
+def _log_tail(log_file, lines=15):
+    with open(log_file, encoding='utf-8', errors='replace') as f:
+        return ''.join(f.readlines()[-lines:])
+
+
+def run_pipeline(stages, targets=None, jobs=JOBS, force=(), dry_run=False):
+    """
+    Runs the selected stages in dependency order, up to `jobs` at a time.
+    A stage is skipped when its fingerprint (code, parameters, input contents)
+    matches its last successful run and its outputs are still the ones that
+    run produced. `force` lists stages to run regardless.
+    Returns True if every selected stage is up to date or ran successfully.
+    """
+    order = select(stages, targets or list(stages))
+    forced = set(_matching(stages, force))
+
+    os.makedirs(os.path.join(STATE_DIR, "logs"), exist_ok=True)
+    state_file = os.path.join(STATE_DIR, "state.json")
+    state = {}
+    if os.path.exists(state_file):
+        with open(state_file, encoding='utf-8') as f:
+            state = json.load(f)
+    hashes = HashCache(os.path.join(STATE_DIR, "hashes.json"))
+
+    pending = list(order)
+    done, failed, changed = set(), set(), set()
+    running = {}
+    started = time.perf_counter()
+    print(f"Pipeline: {len(order)} stage(s), up to {jobs} at a time")
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while pending or running:
+            for name in list(pending):
+                stage = stages[name]
+                if any(dep in failed for dep in stage.deps):
+                    pending.remove(name)
+                    failed.add(name)
+                    print(f"  [-] {name}: not run (an upstream stage failed)")
+                    continue
+                if not all(dep in done for dep in stage.deps if dep in order):
+                    continue
+                pending.remove(name)
+
+                # In a dry run, anything downstream of a stage that would run would run too
+                if dry_run and any(dep in changed for dep in stage.deps):
+                    print(f"  [>] {name}: would run (upstream changes)")
+                    changed.add(name)
+                    done.add(name)
+                    continue
+
+                fingerprint = stage.fingerprint(hashes)
+                record = state.get(name)
+                outputs_intact = record is not None and all(
+                    hashes.path_digest(p) == record['outputs'].get(p) for p in stage.outputs)
+                if name not in forced and record and record['fingerprint'] == fingerprint and outputs_intact:
+                    print(f"  [=] {name}: up to date")
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print(f"  [>] {name}: would run")
+                    changed.add(name)
+                    done.add(name)
+                    continue
+
+                print(f"  [>] {name}: running")
+                log_file = os.path.join(STATE_DIR, "logs", name + ".log")
+                running[executor.submit(_run_stage, stage, log_file)] = (name, fingerprint, log_file)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprint, log_file = running.pop(future)
+                ok, seconds = future.result()
+                stage = stages[name]
+                missing = [p for p in stage.outputs if not os.path.exists(p)]
+                if ok and not missing:
+                    state[name] = {
+                        'fingerprint': fingerprint,
+                        'outputs': {p: hashes.path_digest(p) for p in stage.outputs},
+                        'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    }
+                    _write_json(state_file, state)
+                    hashes.save()
+                    done.add(name)
+                    print(f"  [+] {name}: done in {seconds:.1f}s")
+                else:
+                    failed.add(name)
+                    state.pop(name, None)
+                    _write_json(state_file, state)
+                    reason = f"missing output(s) {missing}" if ok else "failed"
+                    print(f"  [!] {name}: {reason} after {seconds:.1f}s (log: {log_file})")
+                    print(_log_tail(log_file))
+
+    hashes.save()
+    print("-" * 40)
+    print(f"{len(done)} stage(s) ok, {len(failed)} failed in {time.perf_counter() - started:.1f}s")
+    return not failed
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline (merge -> dedup -> clean -> aggregate -> detect -> render), "
+                    "skipping stages whose outputs are up to date.")
+    parser.add_argument("targets", nargs='*',
+                        help="Stages to bring up to date, with everything they need (default: all). "
+                             "'merge', 'dedup' and 'render' select every stage of that kind.")
+    parser.add_argument("--jobs", type=int, default=JOBS, help=f"Stages run in parallel (default: {JOBS})")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help=f"Worker processes for the merge/clean stages (default: {WORKERS})")
+    parser.add_argument("--splits", action='append', default=[], metavar="DATASET=PATH",
+                        help="Override a dataset's split folder/glob (e.g. biometric=downloads/bio)")
+    parser.add_argument("--force", action='append', default=[], metavar="STAGE",
+                        help="Run this stage even if it is up to date (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would run")
+    parser.add_argument("--list", action="store_true", help="List the stages and exit")
+    args = parser.parse_args()
+
+    splits = dict(item.split('=', 1) for item in args.splits)
+    stages = build_stages(splits, workers=args.workers)
+
+    if args.list:
+        for stage in stages.values():
+            print(f"{stage.name:18} <- {', '.join(stage.deps) or '-':42} "
+                  f"{subprocess.list2cmdline([stage.script] + stage.args)}")
+        sys.exit(0)
+
+    ok = run_pipeline(stages, args.targets, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,113 @@
+import argparse
+import os
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+from hybrid_ranking import BUFFER_SD, safe_limit_matrix
+from weekly_matrix import WeeklyMatrix
+
+# --- CONFIGURATION ---
+OUTPUT_FOLDER = "National_Top_20_Fraud_Districts"
+
+# What fwdusingai.py's detection leaves behind for this script
+SCORED_WEEKS_FILE = "Scored_District_Weeks.parquet"   # every district-week with its AI flag
+HIT_LIST_FILE = "National_Fraud_Hit_List.csv"          # the top 20 districts, in rank order
+
+
+# ==========================================
+# GENERATE EVIDENCE GRAPHS
+# ==========================================
+def render_evidence_graphs(merged, top_20, output_folder=OUTPUT_FOLDER):
+    """One forensic chart per hit-list district, numbered by rank."""
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    print("Generating Forensic Graphs for Top 20 Targets...")
+    sns.set_style("white")
+
+    # District x week matrices: each district's series is then one row, no scan of the table
+    weekly = WeeklyMatrix.from_weekly(merged, ['state', 'district'])
+    ai_flags = weekly.to_matrix(merged['IS_AI_FRAUD'], fill=False)
+    # Scored weeks saved before Safe_Limit was stored with them get it recomputed
+    limits = weekly.to_matrix(merged['Safe_Limit']) if 'Safe_Limit' in merged else safe_limit_matrix(weekly)
+
+    # FIX: We use 'enumerate' to force a strict 1-20 count
+    # 'rank' will now be 1, 2, 3... regardless of the original row number
+    for rank, (_, row) in enumerate(top_20.iterrows(), 1):
+        state = row['state']
+        district = row['district']
+
+        try:
+            dist_df = weekly.series(weekly.index_of(state, district), Safe_Limit=limits, IS_AI_FRAUD=ai_flags)
+            # The threshold comes with the scored weeks; the buffer only places the annotation
+            safety_buffer = dist_df['New_Kids'].std() * BUFFER_SD
+
+            # Plotting Setup
+            fig, ax1 = plt.subplots(figsize=(14, 7))
+
+            # 1. GREEN LINE (AI Baseline)
+            sns.lineplot(data=dist_df, x='date', y='Safe_Limit', color='#27AE60', linewidth=2, linestyle='--', label='AI-Adjusted Safe Limit', ax=ax1)
+
+            # 2. RED LINE (Actual Kids)
+            sns.lineplot(data=dist_df, x='date', y='New_Kids', color='#C0392B', linewidth=2.5, label='Actual Child Enrolments', ax=ax1)
+
+            # 3. GREY MOUNTAIN (Adult Context)
+            ax2 = ax1.twinx()
+            max_adults = dist_df['Adult_Updates'].max()
+            ax2.set_ylim(0, max_adults * 1.5)
+            ax2.fill_between(dist_df['date'], dist_df['Adult_Updates'], color='grey', alpha=0.15, label='Adult Activity (Control)')
+
+            # 4. HIGHLIGHT HYBRID ANOMALIES
+            hybrid_anomalies = dist_df[
+                (dist_df['New_Kids'] > dist_df['Safe_Limit']) & 
+                (dist_df['IS_AI_FRAUD'] == True)
+            ]
+
+            if not hybrid_anomalies.empty:
+                ax1.scatter(hybrid_anomalies['date'], hybrid_anomalies['New_Kids'], color='red', s=150, zorder=10, edgecolors='black')
+
+                worst_spike = hybrid_anomalies.loc[hybrid_anomalies['New_Kids'].idxmax()]
+
+                ax1.annotate('AI CONFIRMED\nFRAUD SPIKE', 
+                             xy=(worst_spike['date'], worst_spike['New_Kids']),
+                             xytext=(worst_spike['date'], worst_spike['New_Kids'] + (safety_buffer * 3)),
+                             arrowprops=dict(facecolor='black', shrink=0.05),
+                             horizontalalignment='center', color='darkred', fontweight='bold', 
+                             bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="red", lw=2))
+
+            # FIXED TITLE: Uses 'rank' variable (1, 2, 3...)
+            plt.title(f"Target: {district.upper()}, {state.upper()}\n(Ranked #{rank} in National Fraud Severity)", fontsize=16, fontweight='bold')
+
+            ax1.set_ylabel("Child Enrolment Volume", color='#C0392B', fontsize=12)
+            ax2.set_ylabel("Adult Updates (Reference)", color='grey', fontsize=12)
+            ax2.grid(False)
+
+            lines, labels = ax1.get_legend_handles_labels()
+            lines2, labels2 = ax2.get_legend_handles_labels()
+            ax1.legend(lines + lines2, labels + labels2, loc='upper left')
+
+            plt.tight_layout()
+            clean_name = f"{rank:02d}_{state}_{district}".replace(" ", "_") # Adds 01, 02 prefix to file name
+            plt.savefig(f"{output_folder}/{clean_name}_Hybrid_Evidence.png", dpi=150)
+            plt.close()
+            print(f"  Generated Graph #{rank}: {district}")
+
+        except Exception as e:
+            print(f"  Error plotting {district}: {e}")
+
+    print("Done. Graphs should now be numbered 01 to 20 correctly.")
+
+
+# ==========================================
+# EXECUTION (charts only, from the saved detection results)
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draw the evidence graphs for the national hit-list.")
+    parser.add_argument("--output", default=OUTPUT_FOLDER, help=f"Folder for the graphs (default: {OUTPUT_FOLDER})")
+    args = parser.parse_args()
+
+    merged = pd.read_parquet(SCORED_WEEKS_FILE)
+    top_20 = pd.read_csv(HIT_LIST_FILE)
+    render_evidence_graphs(merged, top_20, args.output)
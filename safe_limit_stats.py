@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from hybrid_ranking import BUFFER_SD, FLOOR_QUANTILE, safe_limit_matrix
+from weekly_aggregates import LEVELS, load_weekly_matrix
+from weekly_matrix import WeeklyMatrix
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# The Safe_Limit needs, per entity, the std of New_Kids, the median of the
+# kids-per-adult ratio and the 10% quantile of New_Kids. Instead of re-reading
+# every entity's whole history, these are kept as sufficient statistics and
+# updated with each new week:
+#
+#   moments  count, sum and sum of squares of New_Kids (exact: the counts are integers)
+#   sketches one histogram per entity over log-spaced buckets (relative width
+#            SKETCH_ALPHA), for the ratio and for New_Kids. Quantiles come out within
+#            SKETCH_ALPHA of the exact value, and two sketches merge by adding counts.
+#
+# With a window, only each entity's last `window` weeks count: their raw values
+# are kept in a ring buffer so the week falling out can be subtracted again.
+FILE_ENROL = "Cleaned_Final_Monthly_Data_Combined.csv"
+FILE_UPDATE = "Cleaned_Final_Biometric_Data_Combined.csv"
+
+SKETCH_ALPHA = 0.01
+SKETCH_MIN = 1e-3     # values at or below this (but above 0) share the first bucket
+SKETCH_MAX = 1e7      # and values above this the last
+GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+BUCKETS = 2 + int(np.ceil(np.log(SKETCH_MAX / SKETCH_MIN) / np.log(GAMMA)))
+
+STATS_DIR = "Safe_Limit_Stats_{level}"
+INDEX_FILE = "index.json"
+
+
+def stats_path(level, window=None):
+    return STATS_DIR.format(level=level.title()) + (f"_{window}w" if window else "")
+
+
+def _bucket(values):
+    """Sketch bucket of each value: 0 for zero (or less), then one bucket per factor GAMMA."""
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.ceil(np.log(np.maximum(values, SKETCH_MIN) / SKETCH_MIN) / np.log(GAMMA))
+    return np.where(values > 0, 1 + np.clip(k, 0, BUCKETS - 2), 0).astype(np.int64)
+
+
+def _bucket_value(buckets):
+    """The value a bucket stands for: within SKETCH_ALPHA of anything in it."""
+    return np.where(buckets > 0, SKETCH_MIN * GAMMA ** (buckets - 1) * 2 / (1 + GAMMA), 0.0)
+
+
+def sketch_quantile(counts, q):
+    """Linear-interpolated quantile per row of a (rows x BUCKETS) sketch, as row_quantile would give."""
+    n = counts.sum(axis=1)
+    cumulative = np.cumsum(counts, axis=1)
+    position = q * np.maximum(n - 1, 0)
+    lo = np.floor(position)
+    # The value of rank r is the first bucket holding more than r values
+    below = _bucket_value((cumulative > lo[:, None]).argmax(axis=1))
+    above = _bucket_value((cumulative > np.minimum(lo + 1, np.maximum(n - 1, 0))[:, None]).argmax(axis=1))
+    return np.where(n > 0, below + (above - below) * (position - lo), np.nan)
+
+
+# ==========================================
+# 1. THE STATISTICS
+# ==========================================
+class SafeLimitStats:
+    def __init__(self, keys, window=None):
+        self.keys = list(keys)      # level key names, e.g. ['state', 'district']
+        self.window = window
+        self.entities = []          # key values per row
+        self.index = {}
+        self.through = None         # last week included
+        self.n = np.zeros(0)
+        self.sum = np.zeros(0)
+        self.sum_sq = np.zeros(0)
+        self.total_kids = np.zeros(0)   # all weeks, window or not (for the noise filter)
+        self.ratio_sketch = np.zeros((0, BUCKETS), dtype=np.uint32)
+        self.kids_sketch = np.zeros((0, BUCKETS), dtype=np.uint32)
+        if window:
+            self.ring_kids = np.zeros((0, window))
+            self.ring_ratio = np.zeros((0, window))
+            self.next_slot = np.zeros(0, dtype=np.int64)
+
+    _ROW_ARRAYS = ['n', 'sum', 'sum_sq', 'total_kids', 'ratio_sketch', 'kids_sketch']
+    _RING_ARRAYS = ['ring_kids', 'ring_ratio', 'next_slot']
+
+    def _arrays(self):
+        return self._ROW_ARRAYS + (self._RING_ARRAYS if self.window else [])
+
+    def rows(self, entities):
+        """Rows of these entities (key tuples), adding new ones."""
+        for key in entities:
+            if key not in self.index:
+                self.index[key] = len(self.entities)
+                self.entities.append(key)
+        grow = len(self.entities) - len(self.n)
+        if grow > 0:
+            for name in self._arrays():
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros((grow,) + array.shape[1:], dtype=array.dtype)]))
+        return np.array([self.index[key] for key in entities], dtype=np.int64)
+
+    # --- Updates ---
+    def add(self, rows, kids, adults):
+        """
+        Adds one week: New_Kids and Adult_Updates of the entities at `rows`
+        (each at most once). O(len(rows)), whatever the history length.
+        """
+        kids = np.asarray(kids, dtype=float)
+        ratio = kids / np.where(np.asarray(adults) == 0, 1, adults)
+        if self.window:
+            # The week falling out of a full window is subtracted first
+            full = self.next_slot[rows] >= self.window
+            slots = self.next_slot[rows] % self.window
+            self._count(rows[full], self.ring_kids[rows[full], slots[full]],
+                        self.ring_ratio[rows[full], slots[full]], -1)
+            self.ring_kids[rows, slots] = kids
+            self.ring_ratio[rows, slots] = ratio
+            self.next_slot[rows] += 1
+        self._count(rows, kids, ratio, 1)
+        self.total_kids[rows] += kids
+
+    def _count(self, rows, kids, ratio, sign):
+        self.n[rows] += sign
+        self.sum[rows] += sign * kids
+        self.sum_sq[rows] += sign * kids ** 2
+        # uint32 wraps on -1 and back on +1, so subtracting a counted value is exact
+        np.add.at(self.ratio_sketch, (rows, _bucket(ratio)), np.uint32(1) if sign > 0 else np.uint32(2 ** 32 - 1))
+        np.add.at(self.kids_sketch, (rows, _bucket(kids)), np.uint32(1) if sign > 0 else np.uint32(2 ** 32 - 1))
+
+    def add_weeks(self, m, cols):
+        """Adds weeks `cols` of a WeeklyMatrix, oldest first, reading only those columns."""
+        entity_rows = self.rows(list(m.entities.itertuples(index=False, name=None)))
+        for c in cols:
+            present = np.asarray(m.valid[:, c])
+            self.add(entity_rows[present], np.asarray(m.kids[:, c])[present], np.asarray(m.adults[:, c])[present])
+            self.through = m.weeks[c]
+
+    def merge(self, other):
+        """
+        Adds another (window-less) statistics object over different weeks of the
+        same level, e.g. built from another slice of history.
+        """
+        if self.window or other.window:
+            raise ValueError("windowed statistics cannot be merged: their ring buffers would overlap")
+        rows = self.rows(other.entities)
+        for name in self._ROW_ARRAYS:
+            getattr(self, name)[rows] += getattr(other, name)
+        if other.through is not None and (self.through is None or other.through > self.through):
+            self.through = other.through
+        return self
+
+    # --- The threshold ---
+    def std(self):
+        """Sample std of New_Kids per row (NaN below two weeks)."""
+        with np.errstate(all='ignore'):
+            variance = (self.n * self.sum_sq - self.sum ** 2) / (self.n * (self.n - 1))
+        return np.where(self.n > 1, np.sqrt(np.maximum(variance, 0)), np.nan)
+
+    def safe_limits(self, rows, adults, buffer_sd=BUFFER_SD, floor_quantile=FLOOR_QUANTILE):
+        """
+        The Safe_Limit of the entities at `rows` for weeks with these
+        Adult_Updates: one per row, or a (rows x weeks) matrix.
+        """
+        adults = np.asarray(adults)
+        ratio = sketch_quantile(self.ratio_sketch[rows], 0.5)
+        buffer = self.std()[rows] * buffer_sd
+        floor = sketch_quantile(self.kids_sketch[rows], floor_quantile)
+        if adults.ndim == 2:
+            ratio, buffer, floor = ratio[:, None], buffer[:, None], floor[:, None]
+        return np.maximum(adults * ratio + buffer, floor)
+
+    # ==========================================
+    # 2. PERSISTENCE (same layout as the aggregate stores)
+    # ==========================================
+    def save(self, path):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        for name in self._arrays():
+            np.save(os.path.join(path, name + ".npy"), getattr(self, name))
+        index = {
+            'keys': self.keys,
+            'window': self.window,
+            'alpha': SKETCH_ALPHA,
+            'through': str(self.through.date()) if self.through is not None else None,
+            'entities': [[v.item() if hasattr(v, 'item') else v for v in key] for key in self.entities],
+        }
+        with open(os.path.join(path, INDEX_FILE + ".part"), 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(os.path.join(path, INDEX_FILE + ".part"), os.path.join(path, INDEX_FILE))
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, INDEX_FILE), encoding='utf-8') as f:
+            index = json.load(f)
+        if index['alpha'] != SKETCH_ALPHA:
+            raise ValueError(f"{path} was built with SKETCH_ALPHA={index['alpha']}: rebuild it")
+        stats = cls(index['keys'], index['window'])
+        stats.entities = [tuple(key) for key in index['entities']]
+        stats.index = {key: i for i, key in enumerate(stats.entities)}
+        stats.through = pd.Timestamp(index['through']) if index['through'] else None
+        for name in stats._arrays():
+            setattr(stats, name, np.load(os.path.join(path, name + ".npy")))
+        return stats
+
+
+# ==========================================
+# 3. KEEPING A LEVEL'S STATISTICS UP TO DATE
+# ==========================================
+def update_stats(level, weekly, window=None, through=None):
+    """
+    The level's statistics, loaded from disk and brought up to date by adding
+    only the closed weeks after the saved ones (built from scratch the first
+    time), then saved again. A week is closed once both datasets are complete
+    past it: the weeks before `through` (as in online_detector.py). By default
+    `weekly`'s newest week is taken to be still open: rows can still arrive for
+    it, and a week once added is never revisited, so it waits for the next run.
+    Returns (stats, number of weeks added).
+    """
+    path = stats_path(level, window)
+    if os.path.exists(os.path.join(path, INDEX_FILE)):
+        stats = SafeLimitStats.load(path)
+    else:
+        stats = SafeLimitStats(LEVELS[level], window)
+    weeks = weekly.weeks.to_numpy()
+    closed = weeks < (pd.Timestamp(through) if through is not None else weeks.max())
+    new = np.flatnonzero(closed & (weeks > stats.through) if stats.through is not None else closed)
+    if len(new):
+        stats.add_weeks(weekly, new)
+        stats.save(path)
+    return stats, len(new)
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the Safe_Limit statistics with the weeks added since the last run.")
+    parser.add_argument("--level", choices=list(LEVELS), default='district', help="Level (default: district)")
+    parser.add_argument("--window", type=int, help="Only each entity's last N weeks count (default: all history)")
+    parser.add_argument("--through", help="Both datasets are complete up to this date: add the weeks before it "
+                                          "(default: all but the newest week)")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare the limits with the full recomputation (safe_limit_matrix)")
+    args = parser.parse_args()
+
+    weekly = load_weekly_matrix(args.level, FILE_ENROL, FILE_UPDATE)
+    started = time.monotonic()
+    stats, added = update_stats(args.level, weekly, args.window, args.through)
+    if stats.through is None:
+        parser.exit(message="No closed weeks yet: nothing to add.\n")
+    print(f"{stats_path(args.level, args.window)}: {added} week(s) added in {time.monotonic() - started:.2f}s, "
+          f"{len(stats.entities):,} {args.level}s through {stats.through.date()}")
+
+    if args.check:
+        if args.window:
+            parser.error("--check compares against the full-history limits: run it without --window")
+        # The full recomputation over the same (closed) weeks
+        counted = np.asarray(weekly.valid) & np.asarray(weekly.weeks <= stats.through)
+        exact = safe_limit_matrix(WeeklyMatrix(weekly.keys, weekly.entities, weekly.weeks,
+                                               np.asarray(weekly.kids), np.asarray(weekly.adults), counted))
+        rows = stats.rows(list(weekly.entities.itertuples(index=False, name=None)))
+        approx = np.where(counted, stats.safe_limits(rows, weekly.adults), np.nan)
+        with np.errstate(all='ignore'):
+            error = np.abs(approx - exact) / np.maximum(np.abs(exact), 1)
+        print(f"Relative difference to the full recomputation: median {np.nanmedian(error):.4f}, "
+              f"max {np.nanmax(error):.4f} (sketch accuracy {SKETCH_ALPHA})")
@@ -0,0 +1,109 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from anomaly_model import ARTIFACT_DIR, FEATURES, add_features, load_artifacts
+from hybrid_ranking import MIN_KIDS, safe_limit_matrix
+from safe_limit_stats import update_stats
+from weekly_aggregates import load_weekly_matrix
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Weekly monitoring without refitting: scores only the weeks from the end of
+# the saved AI model's training data on (fwdusingai.py saves it), with the saved
+# scaler and forest, so the same data always gets the same scores.
+FILE_ENROL = "Cleaned_Final_Monthly_Data_Combined.csv"
+FILE_UPDATE = "Cleaned_Final_Biometric_Data_Combined.csv"
+OUTPUT_FILE = "New_Week_Scores.csv"
+
+
+def score_new_weeks(weekly, scaler, model, since, stats=None):
+    """
+    Hybrid scores of the district-weeks after `since`: the saved model's AI
+    flag, the Safe_Limit and ALERT where both agree, as in fwdusingai.py.
+    The limits come from `stats` (SafeLimitStats already including the new
+    weeks, see safe_limit_stats.py), or are recomputed from each district's
+    full history if it is None. Returns one row per new district-week.
+    """
+    cols = np.flatnonzero(weekly.weeks > since)
+    r, c = np.nonzero(np.asarray(weekly.valid[:, cols]))
+    c = cols[c]
+    new = weekly.entities.iloc[r].reset_index(drop=True)
+    new['date'] = weekly.weeks[c]
+    new['New_Kids'] = np.asarray(weekly.kids[r, c])
+    new['Adult_Updates'] = np.asarray(weekly.adults[r, c])
+    if new.empty:
+        return new
+
+    if stats is None:
+        new['Safe_Limit'] = safe_limit_matrix(weekly)[r, c]
+        active = (np.asarray(weekly.kids).sum(axis=1) >= MIN_KIDS)[r]   # the same noise filter
+    else:
+        rows = stats.rows(list(weekly.entities.itertuples(index=False, name=None)))[r]
+        new['Safe_Limit'] = stats.safe_limits(rows, new['Adult_Updates'].to_numpy())
+        active = stats.total_kids[rows] >= MIN_KIDS
+
+    add_features(new)
+    X_scaled = scaler.transform(new[FEATURES])
+    new['AI_Score'] = model.decision_function(X_scaled)   # below 0 = anomaly
+    new['IS_AI_FRAUD'] = model.predict(X_scaled) == -1
+    new['Extra_Kids'] = (new['New_Kids'] - new['Safe_Limit']).clip(lower=0)
+    new['ALERT'] = active & new['IS_AI_FRAUD'] & (new['New_Kids'] > new['Safe_Limit'])
+    return new
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the weeks added since the saved AI model was trained.")
+    parser.add_argument("--model", help=f"Artifact version directory (default: the newest in {ARTIFACT_DIR}/)")
+    parser.add_argument("--since", help="Score weeks after this date (default: the week before the model's "
+                                         "last training week, which may have been partial, so it is scored again)")
+    parser.add_argument("--through", help="Both datasets are complete up to this date: add the weeks before it "
+                                          "to the Safe_Limit statistics (default: all but the newest week)")
+    parser.add_argument("--window", type=int, help="Safe_Limit from each district's last N weeks only")
+    parser.add_argument("--exact-limits", action="store_true",
+                        help="Recompute the Safe_Limit from the full history instead of the incremental statistics")
+    parser.add_argument("--output", default=OUTPUT_FILE, help=f"Scores of the new weeks (default: {OUTPUT_FILE})")
+    args = parser.parse_args()
+
+    saved = load_artifacts(args.model)
+    if saved is None:
+        sys.exit(f"No saved model in {ARTIFACT_DIR}/: run fwdusingai.py first")
+    scaler, model, meta = saved
+    print(f"Model v{meta['version']:04d} (trained on {meta['training_rows']:,} district-weeks up to {meta['last_week']})")
+
+    print("Loading Data...")
+    weekly = load_weekly_matrix('district', FILE_ENROL, FILE_UPDATE)
+    if args.since:
+        since = pd.Timestamp(args.since)
+    else:
+        # The last training week may still have been open when the model was
+        # fitted, so it is scored again with its complete rows
+        last_week = pd.Timestamp(meta['last_week'])
+        earlier = weekly.weeks[weekly.weeks < last_week]
+        since = earlier.max() if len(earlier) else last_week - pd.Timedelta(weeks=1)
+
+    stats = None
+    if not args.exact_limits:
+        # O(new weeks): only the weeks after the saved statistics are added (see safe_limit_stats.py)
+        stats, added = update_stats('district', weekly, args.window, args.through)
+        print(f"  Safe_Limit statistics: {added} new week(s) added")
+    new = score_new_weeks(weekly, scaler, model, since, stats)
+    if new.empty:
+        print(f"No weeks after {since.date()}.")
+        sys.exit(0)
+    new['Model_Version'] = meta['version']
+    new = new.sort_values(['ALERT', 'Extra_Kids'], ascending=False)
+    new.to_csv(args.output, index=False)
+
+    alerts = new[new['ALERT']]
+    print(f"\n{len(new):,} new district-weeks scored "
+          f"({', '.join(str(d.date()) for d in sorted(new['date'].drop_duplicates()))}), {len(alerts)} alert(s)")
+    if not alerts.empty:
+        print(alerts[['state', 'district', 'date', 'New_Kids', 'Safe_Limit', 'Extra_Kids']].to_string(index=False))
+    print(f"Saved to {args.output}")
@@ -1,10 +1,13 @@
 import pandas as pd
 
+from name_normalizer import count_matching
+
 # --- CONFIGURATION ---
 FILE_TO_CHECK = "Final_Submission_Data.csv" 
 
 print(f"Loading {FILE_TO_CHECK}...")
-df = pd.read_csv(FILE_TO_CHECK, low_memory=False)
+# State/District as categories: every check below then works on the few hundred distinct names
+df = pd.read_csv(FILE_TO_CHECK, low_memory=False, dtype={'State': 'category', 'District': 'category'})
 
 print("-" * 40)
 print(f"TOTAL ROWS: {len(df):,}")
@@ -16,8 +19,8 @@ garbage_list = ["West Bengli", "West Bangal", "GURGAON", "100000", "Telengana",
 print("TEST 1: GARBAGE NAME CHECK")
 errors_found = 0
 for bad_name in garbage_list:
-    # Check for exact match or partial match
-    count = df[df['State'].astype(str).str.contains(bad_name, case=False, na=False)].shape[0]
+    # Check for exact match or partial match (scans distinct names, not rows)
+    count = count_matching(df['State'], bad_name)
     if count > 0:
         print(f"  ❌ FAILED: Found {count} rows with '{bad_name}'")
         errors_found += 1
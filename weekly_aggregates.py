@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import columnar_mtime, columnar_path
+from dataset_loader import ADULT_BIOMETRIC_COL, CHILD_ENROLMENT_COL, DATASETS, load_dataset
+from weekly_matrix import WeeklyMatrix
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+FILE_ENROL = DATASETS['enrolment']['file']
+FILE_UPDATE = DATASETS['biometric']['file']
+
+# Weekly buckets (ending on Monday) of child enrolments vs adult biometric updates,
+# at the levels the detectors work on
+WEEK_FREQ = 'W-MON'
+LEVELS = {
+    'state': ['state'],
+    'district': ['state', 'district'],
+    'pincode': ['state', 'district', 'pincode'],
+}
+
+# Each level is stored as entity x week matrices (see weekly_matrix.py), one
+# .npy file per array, plus index.json (keys, weeks, entity key categories).
+# Scripts memory-map the arrays: attaching costs milliseconds and only the
+# pages actually touched are read.
+AGGREGATE_DIR = "Weekly_{level}_Aggregates"
+INDEX_FILE = "index.json"
+
+# Most of the ~19k pincodes see little activity. At the levels listed here,
+# entities that no detector can rank (fewer than SPARSE_MIN_WEEKS weeks, so
+# no std, or fewer than SPARSE_KIDS New_Kids in total, below any noise filter
+# in use) are stored as coordinate lists, their valid cells only, instead of
+# full rows. open_weekly_matrix() leaves them out unless asked for them.
+SPARSE_LEVELS = ['pincode']
+SPARSE_MIN_WEEKS = 2
+SPARSE_KIDS = 25
+
+
+def aggregate_path(level):
+    return AGGREGATE_DIR.format(level=level.title())
+
+
+# ==========================================
+# 1. BUILD
+# ==========================================
+def build_weekly(level, file_enrol=FILE_ENROL, file_update=FILE_UPDATE):
+    """
+    Weekly New_Kids (age 0-5 enrolments) and Adult_Updates (17+ biometric
+    updates) per state, district or pincode, for the weeks present in both
+    datasets. Returns [<level keys>, date, New_Kids, Adult_Updates].
+    """
+    keys = LEVELS[level]
+    df_enrol = load_dataset('enrolment', columns=['date'] + keys + [CHILD_ENROLMENT_COL], path=file_enrol)
+    df_update = load_dataset('biometric', columns=['date'] + keys + [ADULT_BIOMETRIC_COL], path=file_update)
+
+    # 'date' is already a datetime column; rows whose date could not be parsed are NaT
+    df_enrol = df_enrol.dropna(subset=['date'])
+    df_update = df_update.dropna(subset=['date'])
+    if 'pincode' in keys:
+        # Pincode 0 is "unknown", not a place
+        df_enrol = df_enrol[df_enrol['pincode'] != 0]
+        df_update = df_update[df_update['pincode'] != 0]
+
+    # observed=True: state/district are categorical, only aggregate the combinations that actually occur
+    week = pd.Grouper(key='date', freq=WEEK_FREQ)
+    grp_enrol = df_enrol.groupby(keys + [week], observed=True)[CHILD_ENROLMENT_COL].sum().reset_index()
+    grp_update = df_update.groupby(keys + [week], observed=True)[ADULT_BIOMETRIC_COL].sum().reset_index()
+
+    merged = pd.merge(grp_enrol, grp_update, on=keys + ['date'], how='inner')
+    merged.rename(columns={CHILD_ENROLMENT_COL: 'New_Kids', ADULT_BIOMETRIC_COL: 'Adult_Updates'}, inplace=True)
+    return merged
+
+
+# ==========================================
+# 2. THE MEMORY-MAPPED STORE
+# ==========================================
+def _save_keys(m, path, prefix):
+    key_columns = {}
+    for key in m.keys:
+        column = m.entities[key]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Categories in the index, codes (int32) in the array
+            np.save(os.path.join(path, f"{prefix}key_{key}.npy"), column.cat.codes.to_numpy().astype(np.int32))
+            key_columns[key] = {'categories': [str(c) for c in column.cat.categories]}
+        else:
+            np.save(os.path.join(path, f"{prefix}key_{key}.npy"), column.to_numpy())
+            key_columns[key] = {}
+    return key_columns
+
+
+def save_weekly_matrix(m, path, sparse=False):
+    """
+    Writes a WeeklyMatrix as `path`/{kids,adults,valid,key_<name>}.npy plus
+    index.json. The index is written last, so a half-written store is never read.
+    With sparse=True the low-activity entities (see SPARSE_LEVELS) go to
+    sparse_{entity,week,kids,adults}.npy and sparse_key_<name>.npy instead.
+    """
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    index = {'keys': m.keys, 'weeks': [str(week.date()) for week in m.weeks]}
+    if sparse:
+        dense = (m.valid.sum(axis=1) >= SPARSE_MIN_WEEKS) & (m.kids.sum(axis=1) >= SPARSE_KIDS)
+        low = m.subset(~dense)
+        m = m.subset(dense)
+        entity, week = np.nonzero(low.valid)
+        np.save(os.path.join(path, "sparse_entity.npy"), entity.astype(np.int32))
+        np.save(os.path.join(path, "sparse_week.npy"), week.astype(np.int16))
+        np.save(os.path.join(path, "sparse_kids.npy"), low.kids[entity, week])
+        np.save(os.path.join(path, "sparse_adults.npy"), low.adults[entity, week])
+        index['sparse_entities'] = int(low.kids.shape[0])
+        index['sparse_key_columns'] = _save_keys(low, path, "sparse_")
+
+    np.save(os.path.join(path, "kids.npy"), np.ascontiguousarray(m.kids))
+    np.save(os.path.join(path, "adults.npy"), np.ascontiguousarray(m.adults))
+    np.save(os.path.join(path, "valid.npy"), np.ascontiguousarray(m.valid))
+    index['entities'] = int(m.kids.shape[0])
+    index['key_columns'] = _save_keys(m, path, "")
+
+    with open(os.path.join(path, INDEX_FILE + ".part"), 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(os.path.join(path, INDEX_FILE + ".part"), os.path.join(path, INDEX_FILE))
+
+
+def open_weekly_matrix(path, include_sparse=False):
+    """
+    Attaches to a saved store without reading the arrays: they are memory-mapped
+    (read-only), and the entity table is only built when first used.
+    Entities stored sparsely are left out, unless include_sparse=True: then
+    they are expanded and appended after the others, in memory.
+    """
+    with open(os.path.join(path, INDEX_FILE), encoding='utf-8') as f:
+        index = json.load(f)
+
+    def array(name):
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode='r')
+
+    def entity_table(key_columns, prefix=""):
+        columns = {}
+        for key, spec in key_columns.items():
+            values = array(f"{prefix}key_{key}")
+            if 'categories' in spec:
+                columns[key] = pd.Categorical.from_codes(np.asarray(values), categories=spec['categories'])
+            else:
+                columns[key] = np.asarray(values)
+        return pd.DataFrame(columns)
+
+    weeks = pd.DatetimeIndex(index['weeks'])
+    m = WeeklyMatrix(index['keys'], lambda: entity_table(index['key_columns']), weeks,
+                     array("kids"), array("adults"), array("valid"))
+    if not include_sparse or not index.get('sparse_entities'):
+        return m
+
+    shape = (index['sparse_entities'], len(weeks))
+    entity, week = array("sparse_entity"), array("sparse_week")
+    kids, adults, valid = np.zeros(shape, dtype=m.kids.dtype), np.zeros(shape, dtype=m.adults.dtype), np.zeros(shape, dtype=bool)
+    kids[entity, week] = array("sparse_kids")
+    adults[entity, week] = array("sparse_adults")
+    valid[entity, week] = True
+    entities = pd.concat([m.entities, entity_table(index['sparse_key_columns'], "sparse_")], ignore_index=True)
+    return WeeklyMatrix(index['keys'], entities, weeks, np.vstack([m.kids, kids]),
+                        np.vstack([m.adults, adults]), np.vstack([m.valid, valid]))
+
+
+def _newest_input(paths):
+    times = [os.path.getmtime(path) for path in paths if os.path.exists(path)]
+    return max(times + [columnar_mtime(columnar_path(path)) for path in paths], default=0)
+
+
+def is_fresh(level, file_enrol=FILE_ENROL, file_update=FILE_UPDATE):
+    """True if the level's store exists and is at least as new as the cleaned datasets."""
+    index = os.path.join(aggregate_path(level), INDEX_FILE)
+    return os.path.exists(index) and os.path.getmtime(index) >= _newest_input([file_enrol, file_update])
+
+
+# ==========================================
+# 3. LOAD (from the store when it is up to date)
+# ==========================================
+def load_weekly_matrix(level, file_enrol=FILE_ENROL, file_update=FILE_UPDATE, include_sparse=False):
+    """
+    The level's entity x week matrices, memory-mapped from its store when that
+    is at least as new as the cleaned datasets; otherwise rebuilt (and saved).
+    """
+    path = aggregate_path(level)
+    if not is_fresh(level, file_enrol, file_update):
+        weekly = build_weekly(level, file_enrol, file_update)
+        save_weekly_matrix(WeeklyMatrix.from_weekly(weekly, LEVELS[level]), path, sparse=level in SPARSE_LEVELS)
+    else:
+        print(f"  Attaching {path} (weekly {level} aggregates)")
+    return open_weekly_matrix(path, include_sparse)
+
+
+def load_weekly(level, file_enrol=FILE_ENROL, file_update=FILE_UPDATE):
+    """The weekly table for `level` ([<keys>, date, New_Kids, Adult_Updates]), via the store."""
+    return load_weekly_matrix(level, file_enrol, file_update, include_sparse=True).to_weekly()
+
+
+# ==========================================
+# EXECUTION
+# ==========================================
+def check_formats(file_enrol=FILE_ENROL, file_update=FILE_UPDATE):
+    """
+    Loads the cleaned files once from the CSVs and once from their Parquet
+    twins and checks that both give the same categories and the same weekly
+    tables at every level (row order included: the AI model depends on it).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        # Each folder links only one format, so load_dataset() has no choice
+        paths = {}
+        for fmt in ('csv', 'parquet'):
+            os.makedirs(os.path.join(tmp, fmt))
+            paths[fmt] = []
+            for path in (file_enrol, file_update):
+                source = path if fmt == 'csv' else columnar_path(path)
+                os.symlink(os.path.abspath(source), os.path.join(tmp, fmt, os.path.basename(source)))
+                paths[fmt].append(os.path.join(tmp, fmt, os.path.basename(path)))
+
+        for name, index in (('enrolment', 0), ('biometric', 1)):
+            csv_df, parquet_df = (load_dataset(name, columns=['state', 'district'], path=paths[fmt][index])
+                                  for fmt in ('csv', 'parquet'))
+            for col in ('state', 'district'):
+                if not csv_df[col].cat.categories.equals(parquet_df[col].cat.categories):
+                    raise AssertionError(f"{name} {col}: categories differ between CSV and Parquet")
+        for level in LEVELS:
+            pd.testing.assert_frame_equal(build_weekly(level, *paths['csv']), build_weekly(level, *paths['parquet']))
+            print(f"  {level}: CSV and Parquet give identical weekly tables")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate the cleaned datasets into weekly entity x week stores.")
+    parser.add_argument("--enrolment", default=FILE_ENROL, help=f"Cleaned enrolment file (default: {FILE_ENROL})")
+    parser.add_argument("--biometric", default=FILE_UPDATE, help=f"Cleaned biometric file (default: {FILE_UPDATE})")
+    parser.add_argument("--levels", nargs='+', choices=list(LEVELS), default=list(LEVELS),
+                        help="Levels to build (default: all)")
+    parser.add_argument("--check", action="store_true",
+                        help="Only check that the CSVs and their Parquet twins load identically")
+    args = parser.parse_args()
+
+    if args.check:
+        check_formats(args.enrolment, args.biometric)
+        parser.exit()
+
+    for level in args.levels:
+        print(f"Aggregating by {level}...")
+        weekly = build_weekly(level, args.enrolment, args.biometric)
+        m = WeeklyMatrix.from_weekly(weekly, LEVELS[level])
+        save_weekly_matrix(m, aggregate_path(level), sparse=level in SPARSE_LEVELS)
+        dense = open_weekly_matrix(aggregate_path(level)).kids.shape[0]
+        print(f"  {m.kids.shape[0]:,} {level}s x {m.kids.shape[1]} weeks saved to {aggregate_path(level)}/"
+              + (f" ({m.kids.shape[0] - dense:,} low-activity ones sparsely)" if dense < m.kids.shape[0] else ""))
@@ -0,0 +1,184 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ENTITY x WEEK MATRICES
+# ==========================================
+# A weekly table (one row per entity-week, as built by weekly_aggregates.py) is a
+# small, regular time series per entity. Stored densely, every detector formula
+# becomes a whole-matrix NumPy operation, and any entity's series is one row.
+#
+#   kids[i, w]   New_Kids of entity i in week w
+#   adults[i, w] Adult_Updates
+#   valid[i, w]  False where the entity has no row for that week (value 0 there)
+#
+# entities (row i -> its key values) and weeks (column w -> week-ending date)
+# are the index; rows/cols remember where each row of the source table went, so
+# per-row results (e.g. a model's flags) can be moved in and out of the matrix.
+# The arrays may be memory-mapped (see weekly_aggregates.py); `entities` may be
+# given as a function that builds the table on first use.
+
+
+class WeeklyMatrix:
+    def __init__(self, keys, entities, weeks, kids, adults, valid, rows=None, cols=None):
+        self.keys = list(keys)
+        self._entities = entities
+        self.weeks = weeks
+        self.kids = kids
+        self.adults = adults
+        self.valid = valid
+        self.rows = rows
+        self.cols = cols
+        self._lookup = None
+
+    @classmethod
+    def from_weekly(cls, df, keys):
+        """
+        Builds the matrices from a weekly table with columns [<keys>, date,
+        New_Kids, Adult_Updates]. Entities are numbered in order of first
+        appearance; rows whose key is missing belong to no entity.
+        """
+        keys = list(keys)
+        # Hash-factorize each key, then the combined codes (first appearance order, -1 = missing key)
+        combined = np.zeros(len(df), dtype=np.int64)
+        missing = np.zeros(len(df), dtype=bool)
+        for k in keys:
+            codes, uniques = pd.factorize(df[k])
+            combined = combined * (len(uniques) + 1) + codes
+            missing |= codes < 0
+        entity_of_row = np.full(len(df), -1, dtype=np.int64)
+        entity_of_row[~missing] = pd.factorize(combined[~missing])[0]
+        has_entity = entity_of_row >= 0
+        week_of_row, weeks = pd.factorize(df['date'], sort=True)
+
+        # Ids are numbered by first appearance, so an entity first appears where the running max grows
+        positions = np.flatnonzero(has_entity)
+        ids = entity_of_row[positions]
+        first = np.ones(len(ids), dtype=bool)
+        first[1:] = ids[1:] > np.maximum.accumulate(ids)[:-1]
+        entities = df[keys].iloc[positions[first]].reset_index(drop=True)
+
+        rows = entity_of_row
+        shape = (len(entities), len(weeks))
+        valid = np.zeros(shape, dtype=bool)
+        kids = np.zeros(shape, dtype=df['New_Kids'].dtype)
+        adults = np.zeros(shape, dtype=df['Adult_Updates'].dtype)
+        r, c = rows[has_entity], week_of_row[has_entity]
+        if len(r) and np.bincount(r * shape[1] + c).max() > 1:
+            raise ValueError("the weekly table has more than one row for some entity-week")
+        valid[r, c] = True
+        kids[r, c] = df['New_Kids'].to_numpy()[has_entity]
+        adults[r, c] = df['Adult_Updates'].to_numpy()[has_entity]
+        return cls(keys, entities, pd.DatetimeIndex(weeks), kids, adults, valid, rows, week_of_row)
+
+    @property
+    def entities(self):
+        if callable(self._entities):
+            self._entities = self._entities()
+        return self._entities
+
+    def to_weekly(self):
+        """
+        The matrices as a weekly table [<keys>, date, New_Kids, Adult_Updates]:
+        the valid cells entity by entity, weeks in date order. rows/cols then
+        refer to this table.
+        """
+        self.rows, self.cols = np.nonzero(self.valid)
+        df = self.entities.iloc[self.rows].reset_index(drop=True)
+        df['date'] = self.weeks[self.cols]
+        df['New_Kids'] = self.kids[self.rows, self.cols]
+        df['Adult_Updates'] = self.adults[self.rows, self.cols]
+        return df
+
+    # --- Moving per-row values in and out ---
+    def to_matrix(self, values, fill=np.nan):
+        """A per-row array/Series of the source table as an entity x week matrix."""
+        values = np.asarray(values)
+        out = np.full(self.kids.shape, fill, dtype=np.result_type(values.dtype, np.asarray(fill).dtype))
+        has_entity = self.rows >= 0
+        out[self.rows[has_entity], self.cols[has_entity]] = values[has_entity]
+        return out
+
+    def to_rows(self, matrix, fill=np.nan):
+        """An entity x week matrix as a per-row array aligned with the source table."""
+        out = np.full(len(self.rows), fill, dtype=np.result_type(matrix.dtype, np.asarray(fill).dtype))
+        has_entity = self.rows >= 0
+        out[has_entity] = matrix[self.rows[has_entity], self.cols[has_entity]]
+        return out
+
+    def subset(self, rows):
+        """The entities at `rows` (indices or a bool mask) as their own WeeklyMatrix."""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        return WeeklyMatrix(self.keys, self.entities.iloc[rows].reset_index(drop=True), self.weeks,
+                            self.kids[rows], self.adults[rows], self.valid[rows])
+
+    # --- One entity ---
+    def index_of(self, *key):
+        """Row of the entity with these key values, e.g. index_of('Assam', 'Goalpara')."""
+        if self._lookup is None:
+            self._lookup = {tuple(k): i for i, k in enumerate(self.entities.itertuples(index=False, name=None))}
+        return self._lookup[tuple(key)]
+
+    def series(self, i, **matrices):
+        """
+        Entity i's weekly series as a small frame [date, New_Kids, Adult_Updates,
+        <extra matrices by name>], its valid weeks only, in date order.
+        """
+        weeks = self.valid[i]
+        frame = pd.DataFrame({
+            'date': self.weeks[weeks],
+            'New_Kids': self.kids[i, weeks],
+            'Adult_Updates': self.adults[i, weeks],
+        })
+        for name, matrix in matrices.items():
+            frame[name] = matrix[i, weeks]
+        return frame
+
+
+# ==========================================
+# ROW-WISE STATISTICS OVER THE VALID WEEKS
+# ==========================================
+def _masked(matrix, valid):
+    return np.where(valid, matrix, np.nan).astype(float)
+
+
+def row_median(matrix, valid):
+    """Median per row (NaN for a row without valid weeks)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)   # "All-NaN slice"
+        return np.nanmedian(_masked(matrix, valid), axis=1)
+
+
+def row_std(matrix, valid, ddof=1):
+    """Sample std per row (NaN with fewer than ddof + 1 valid weeks), like pandas."""
+    values = _masked(matrix, valid)
+    n = valid.sum(axis=1)
+    mean = np.nansum(values, axis=1) / np.maximum(n, 1)
+    squares = np.nansum((values - mean[:, None]) ** 2, axis=1)
+    with np.errstate(all='ignore'):
+        return np.where(n > ddof, np.sqrt(squares / (n - ddof)), np.nan)
+
+
+def row_quantile(matrix, valid, q):
+    """
+    Linear-interpolated quantile per row (as pandas/NumPy), via one row-wise sort.
+    `q` may be a list: the result then has one row per quantile, from the same sort.
+    """
+    values = np.sort(_masked(matrix, valid), axis=1)   # NaN sorts last
+    n = valid.sum(axis=1)
+    last = np.maximum(n - 1, 0)
+    position = np.asarray(q, dtype=float)[..., None] * last
+    lo = np.floor(position).astype(int)
+    hi = np.minimum(lo + 1, last)
+    rows = np.arange(len(values))
+    below = values[rows, lo]
+    above = values[rows, hi]
+    t = position - lo
+    diff = above - below
+    # NumPy's lerp: exact at both ends
+    result = np.where(t >= 0.5, above - diff * (1 - t), below + diff * t)
+    return np.where(n > 0, result, np.nan)